@@ -0,0 +1,155 @@
+import asyncio
+import itertools
+import os
+from typing import Dict, Any, List, Optional
+
+from benchmarks.harness import Benchmark
+from roles.engineer import CustomEngineer
+from roles.keyword_rules import KEYWORD_INDEX, ALL_RULES
+from utils.artifact_store import ArtifactStore
+from utils.keyword_index import apply_rules
+from utils.logger import close_project_loggers
+from utils.message_sender import MessageSender, OutputChannel
+from utils.template_engine import TemplateEngine
+from workflows.project_workflow import ProjectWorkflow
+
+PROJECT_TYPES = ('web_app', 'api', 'script')
+
+# 关键词分析的描述长度：100 B 到 1 MB
+DESCRIPTION_SIZES = (100, 1024, 10 * 1024, 100 * 1024, 1024 * 1024)
+
+SAMPLE_DESCRIPTION = '一个面向团队的项目管理平台，支持任务分配、文件共享、评论反馈和数据分析报告。'
+
+def capture_sender(project_id: str = 'bench') -> MessageSender:
+    """输出被丢弃的发送器：消息仍会完整序列化，但不写 stdout"""
+    return MessageSender(project_id, OutputChannel(write=lambda line: None))
+
+def make_description(size: int) -> str:
+    """生成指定 UTF-8 字节数的描述；只有末尾包含规则关键词，扫描无法提前结束"""
+    filler = 'The quick brown fox jumps over the lazy dog. '
+    tail = SAMPLE_DESCRIPTION
+    body_size = max(0, size - len(tail.encode('utf-8')))
+    return (filler * (body_size // len(filler) + 1))[:body_size] + tail
+
+def workflow_benchmarks(artifact_dir: str, scratch_dir: Optional[str] = None) -> List[Benchmark]:
+    """每种项目类型端到端运行一次 ProjectWorkflow（不等待、不使用结果缓存，计入工作区和检查点落盘）"""
+    store = ArtifactStore(artifact_dir)
+    scratch_dir = scratch_dir or os.path.dirname(os.path.abspath(artifact_dir))
+    benchmarks = []
+    for project_type in PROJECT_TYPES:
+        config = {
+            'name': 'Benchmark',
+            'projectType': project_type,
+            'description': SAMPLE_DESCRIPTION,
+            'requirements': ['用户登录', '数据导出']
+        }
+
+        async def run(config: Dict[str, Any] = config) -> None:
+            workflow = ProjectWorkflow('bench', config, capture_sender(), pacing='none',
+                                       artifact_store=store, use_cache=False,
+                                       workspace_dir=os.path.join(scratch_dir, 'workspaces'),
+                                       checkpoint_dir=os.path.join(scratch_dir, 'checkpoints'))
+            await workflow.execute()
+            close_project_loggers('bench')
+
+        benchmarks.append(Benchmark(f'workflow.{project_type}', run, min_time=0.2))
+    return benchmarks
+
+def message_sender_benchmarks() -> List[Benchmark]:
+    sender = capture_sender()
+    progress = {
+        'type': 'progress',
+        'payload': {'stage': 'code_development', 'progress': 50, 'message': '工程师正在编写代码...'}
+    }
+    content = make_description(1024 * 1024)
+    file = {'fileName': 'big.txt', 'filePath': '/big.txt', 'content': content, 'fileType': 'text',
+            'createdBy': 'Benchmark'}
+
+    async def send_progress() -> None:
+        await sender.send_message(progress)
+
+    async def send_large_file() -> None:
+        await sender.send_file(file)
+
+    return [
+        Benchmark('message_sender.send_message', send_progress),
+        Benchmark('message_sender.send_file_1mb', send_large_file, size=len(content.encode('utf-8'))),
+    ]
+
+def renderer_benchmarks() -> List[Benchmark]:
+    """工程师的各个渲染方法；使用不缓存的模板引擎，每次调用都真实渲染"""
+    engineer = CustomEngineer('bench', capture_sender())
+    engineer.templates = TemplateEngine(cache_size=0)
+    counter = itertools.count()
+
+    benchmarks = []
+    for name in ('vue_app', 'home_page', 'server_js', 'models', 'api_app', 'api_routes', 'python_script'):
+        render = getattr(engineer, f'_generate_{name}')
+        benchmarks.append(Benchmark(
+            f'engineer.render.{name}',
+            lambda render=render: render(f'{SAMPLE_DESCRIPTION}{next(counter)}')
+        ))
+    benchmarks.append(Benchmark('engineer.render.config_file', engineer._generate_config_file))
+    return benchmarks
+
+def keyword_benchmarks() -> List[Benchmark]:
+    """角色关键词分析：一次扫描描述并应用全部规则"""
+    benchmarks = []
+    for size in DESCRIPTION_SIZES:
+        description = make_description(size)
+        benchmarks.append(Benchmark(
+            f'keywords.analyze_{size}b',
+            lambda description=description: apply_rules(ALL_RULES, KEYWORD_INDEX.scan(description)),
+            size=size
+        ))
+    return benchmarks
+
+def prompt_cache_benchmarks(scratch_dir: str) -> List[Benchmark]:
+    """模型响应缓存命中时的开销（规范化、摘要和一次 SQLite 查询）"""
+    from llm.prompt_cache import PromptCache, prompt_key
+
+    cache = PromptCache(os.path.join(scratch_dir, 'llm_responses.sqlite3'))
+    messages = [{'role': 'system', 'content': '你是一名软件架构师。'},
+                {'role': 'user', 'content': make_description(4 * 1024)}]
+    key = prompt_key(messages, 'bench', 1024, 0.2)
+    cache.put(key, {'content': make_description(2 * 1024), 'model': 'bench', 'usage': {'total_tokens': 1500}}, 1.0)
+
+    def hit() -> None:
+        cache.get(prompt_key(messages, 'bench', 1024, 0.2))
+
+    return [Benchmark('llm.prompt_cache_hit', hit, teardown=cache.close)]
+
+def llm_benchmarks() -> List[Benchmark]:
+    """通过共享连接池并发调用本地假模型服务；未安装 aiohttp 时跳过"""
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        return []
+    from llm.fake_server import FakeLLMServer
+    from llm.provider import OpenAICompatibleProvider
+    from llm.rate_limit import RateLimiter
+
+    server = FakeLLMServer().start()
+    provider = OpenAICompatibleProvider(server.base_url, model='fake', limiter=RateLimiter(
+        requests_per_minute=1e9, tokens_per_minute=1e12, max_concurrency=16))
+    messages = [{'role': 'user', 'content': SAMPLE_DESCRIPTION}]
+
+    async def burst() -> None:
+        await asyncio.gather(*(provider.complete(messages, max_tokens=64) for _ in range(32)))
+
+    async def teardown() -> None:
+        await provider.aclose()
+        server.stop()
+
+    return [Benchmark('llm.fake_burst_32', burst, min_time=0.2, teardown=teardown)]
+
+def all_benchmarks(artifact_dir: str, scratch_dir: Optional[str] = None) -> List[Benchmark]:
+    scratch_dir = scratch_dir or os.path.dirname(os.path.abspath(artifact_dir))
+    return (
+        workflow_benchmarks(artifact_dir, scratch_dir)
+        + message_sender_benchmarks()
+        + renderer_benchmarks()
+        + keyword_benchmarks()
+        + prompt_cache_benchmarks(scratch_dir)
+        + llm_benchmarks()
+    )
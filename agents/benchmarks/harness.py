@@ -0,0 +1,76 @@
+import asyncio
+import inspect
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Callable, Awaitable, Optional, Union
+
+BenchFunc = Callable[[], Union[None, Awaitable[None]]]
+
+@dataclass
+class Benchmark:
+    """一个基准用例：func 为一次操作（同步或异步），size 为每次操作处理的字节数（可选）"""
+    name: str
+    func: BenchFunc
+    size: int = 0
+    # 每轮至少运行的秒数，过短的操作自动合并为多次调用
+    min_time: float = 0.05
+    rounds: int = 5
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # 测量结束后调用一次，用于关闭用例持有的会话或服务
+    teardown: Optional[BenchFunc] = None
+
+async def _call(func: BenchFunc) -> None:
+    result = func()
+    if inspect.isawaitable(result):
+        await result
+
+async def _time_calls(func: BenchFunc, number: int) -> float:
+    started = time.perf_counter()
+    for _ in range(number):
+        await _call(func)
+    return time.perf_counter() - started
+
+async def measure(bench: Benchmark) -> Dict[str, Any]:
+    """运行基准用例：先预热并校准每轮调用次数，再运行 rounds 轮取统计值"""
+    await _call(bench.func)
+
+    number = 1
+    while True:
+        elapsed = await _time_calls(bench.func, number)
+        if elapsed >= bench.min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < bench.min_time / 10 else 2
+
+    per_call: List[float] = []
+    for _ in range(bench.rounds):
+        per_call.append(await _time_calls(bench.func, number) / number)
+
+    median = statistics.median(per_call)
+    result = {
+        'median_s': median,
+        'min_s': min(per_call),
+        'stdev_s': statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        'ops_per_s': 1 / median if median > 0 else 0.0,
+        'calls_per_round': number,
+        'rounds': bench.rounds
+    }
+    if bench.size:
+        result['bytes'] = bench.size
+        result['mb_per_s'] = bench.size / median / 1e6 if median > 0 else 0.0
+    result.update(bench.metadata)
+    return result
+
+def run_benchmarks(benchmarks: List[Benchmark], report: Callable[[str, Dict[str, Any]], None]) -> Dict[str, Dict[str, Any]]:
+    """在同一个事件循环中依次运行所有用例"""
+    async def run_all() -> Dict[str, Dict[str, Any]]:
+        results = {}
+        for bench in benchmarks:
+            try:
+                results[bench.name] = await measure(bench)
+            finally:
+                if bench.teardown is not None:
+                    await _call(bench.teardown)
+            report(bench.name, results[bench.name])
+        return results
+    return asyncio.run(run_all())
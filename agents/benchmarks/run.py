@@ -0,0 +1,133 @@
+"""智能体流水线基准测试
+
+在 agents 目录下运行:
+    python -m benchmarks.run run --output benchmarks/baselines/local.json [--filter keywords]
+    python -m benchmarks.run compare benchmarks/baselines/default.json benchmarks/baselines/local.json
+    python -m benchmarks.run startup --budget-ms 250
+compare 在任一用例的最短耗时（--stat median 时为中位耗时）比基线慢超过 --threshold（默认 15%）
+时以退出码 1 结束；微基准的最短耗时受机器噪声影响最小。
+startup 测量 main.py 从启动到输出第一条消息的耗时，中位数超过预算时以退出码 1 结束。
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+from typing import Dict, Any, List, Optional, Tuple
+
+from benchmarks.cases import all_benchmarks
+from benchmarks.harness import run_benchmarks
+from benchmarks.startup import measure_startup
+from utils.logger import configure_logging
+
+def _report(name: str, result: Dict[str, Any]) -> None:
+    line = f"{name:<40} {result['median_s'] * 1e6:>12.1f} us  {result['ops_per_s']:>12.1f} ops/s"
+    if 'mb_per_s' in result:
+        line += f"  {result['mb_per_s']:>8.1f} MB/s"
+    print(line, file=sys.stderr)
+
+def run(output: Optional[str], name_filter: Optional[str], rounds: Optional[int]) -> Dict[str, Any]:
+    """运行基准测试并写出 JSON 结果"""
+    with tempfile.TemporaryDirectory(prefix='agents-bench-') as tmp:
+        # 日志只写到临时目录，避免控制台输出干扰计时
+        configure_logging(log_dir=os.path.join(tmp, 'logs'), console=False)
+        benchmarks = all_benchmarks(os.path.join(tmp, 'artifacts'), tmp)
+        if name_filter:
+            benchmarks = [bench for bench in benchmarks if name_filter in bench.name]
+        if rounds:
+            for bench in benchmarks:
+                bench.rounds = rounds
+        results = run_benchmarks(benchmarks, _report)
+
+    baseline = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()
+        },
+        'results': results
+    }
+    text = json.dumps(baseline, ensure_ascii=False, indent=2, sort_keys=True)
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return baseline
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            threshold: float, stat: str = 'min') -> Tuple[List[str], List[str]]:
+    """比较两次结果的每次调用耗时（min 或 median），返回 (报告行, 退化的用例)"""
+    key = f'{stat}_s'
+    lines = [f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>9}"]
+    regressions = []
+    base_results = baseline.get('results', {})
+    current_results = current.get('results', {})
+
+    for name in sorted(set(base_results) | set(current_results)):
+        if name not in base_results or name not in current_results:
+            lines.append(f"{name:<40} {'(only in ' + ('current' if name in current_results else 'baseline') + ')':>35}")
+            continue
+        before = base_results[name][key]
+        after = current_results[name][key]
+        change = (after - before) / before if before > 0 else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        lines.append(f"{name:<40} {before * 1e6:>10.1f}us {after * 1e6:>10.1f}us {change:>+8.1%}{flag}")
+    return lines, regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Agents pipeline benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run the benchmarks and save results as JSON')
+    run_parser.add_argument('--output', help='Path of the JSON result file (default: stdout)')
+    run_parser.add_argument('--filter', help='Only run benchmarks whose name contains this string')
+    run_parser.add_argument('--rounds', type=int, help='Measured rounds per benchmark (default: 5)')
+
+    compare_parser = commands.add_parser('compare', help='Compare a result file against a baseline')
+    compare_parser.add_argument('baseline', help='Baseline JSON file')
+    compare_parser.add_argument('current', help='Current JSON file')
+    compare_parser.add_argument('--threshold', type=float, default=0.15,
+                                help='Relative slowdown that counts as a regression (default: 0.15)')
+    compare_parser.add_argument('--stat', choices=['min', 'median'], default='min',
+                                help='Per-call time statistic to compare (default: min)')
+    startup_parser = commands.add_parser('startup', help='Check time from process start to the first message')
+    startup_parser.add_argument('--budget-ms', type=float, default=250.0,
+                                help='Maximum median time to the first message (default: 250)')
+    startup_parser.add_argument('--runs', type=int, default=5, help='Number of measured runs (default: 5)')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        run(args.output, args.filter, args.rounds)
+        return
+    if args.command == 'startup':
+        result = measure_startup(args.runs)
+        median_ms = result['median_s'] * 1000
+        print(f"time to first message: median {median_ms:.1f} ms, min {result['min_s'] * 1000:.1f} ms, "
+              f"max {result['max_s'] * 1000:.1f} ms over {result['runs']} runs (budget {args.budget_ms:.0f} ms)")
+        if median_ms > args.budget_ms:
+            print(f'startup budget exceeded by {median_ms - args.budget_ms:.1f} ms')
+            sys.exit(1)
+        return
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, 'r', encoding='utf-8') as f:
+        current = json.load(f)
+    lines, regressions = compare(baseline, current, args.threshold, args.stat)
+    print('\n'.join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
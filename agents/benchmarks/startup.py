@@ -0,0 +1,54 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+AGENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+STARTUP_CONFIG = {
+    'name': 'Startup',
+    'projectType': 'web_app',
+    'description': '启动耗时基准',
+    'requirements': []
+}
+
+def time_to_first_message(scratch_dir: str) -> float:
+    """启动一个 main.py 进程，返回从启动到 stdout 出现第一条消息的秒数；日志、存储、工作区和检查点都写到 scratch_dir"""
+    command = [
+        sys.executable, os.path.join(AGENTS_DIR, 'main.py'),
+        '--project-id', 'startup-bench',
+        '--config', json.dumps(STARTUP_CONFIG, ensure_ascii=False),
+        '--pacing', 'none', '--no-cache',
+        '--log-dir', os.path.join(scratch_dir, 'logs'),
+        '--artifact-dir', os.path.join(scratch_dir, 'artifacts'),
+        '--workspace-dir', os.path.join(scratch_dir, 'workspaces'),
+        '--checkpoint-dir', os.path.join(scratch_dir, 'checkpoints')
+    ]
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=AGENTS_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        line = process.stdout.readline()
+        elapsed = time.perf_counter() - started
+        if not line:
+            raise RuntimeError('main.py exited without sending a message')
+        json.loads(line)
+    finally:
+        process.stdout.close()
+        process.wait()
+    return elapsed
+
+def measure_startup(runs: int = 5) -> Dict[str, Any]:
+    """多次测量启动到第一条消息的耗时（第一次作为预热不计入，排除磁盘缓存和 .pyc 编译）"""
+    with tempfile.TemporaryDirectory(prefix='agents-startup-') as scratch_dir:
+        time_to_first_message(scratch_dir)
+        samples: List[float] = [time_to_first_message(scratch_dir) for _ in range(runs)]
+    return {
+        'median_s': statistics.median(samples),
+        'min_s': min(samples),
+        'max_s': max(samples),
+        'runs': runs
+    }
@@ -0,0 +1,128 @@
+"""本地假模型服务，离线测试和基准测试 llm 客户端使用
+
+实现 OpenAI 兼容的 POST /v1/chat/completions：回复内容为最后一条用户消息的回显，
+可以设置响应延迟，并每隔 N 个请求返回一次 429（带 Retry-After）。
+在 agents 目录下运行:
+    python -m llm.fake_server --port 8089 --latency 0.05 --rate-limit-every 10
+"""
+import argparse
+import json
+import threading
+import time
+from typing import Dict, Any, Optional
+
+class FakeLLMServer:
+    """在后台线程中运行的假模型服务，统计请求数、429 次数、TCP 连接数和最大并发"""
+
+    def __init__(self, port: int = 0, host: str = '127.0.0.1', latency: float = 0.0,
+                 rate_limit_every: int = 0, retry_after: float = 0.05):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        server = self
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self.connections = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 才会保持连接，用于验证客户端复用连接池
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path.rstrip('/') != '/v1/chat/completions':
+                    self._reply(404, {'error': {'message': 'not found'}})
+                    return
+                with server._lock:
+                    server.requests += 1
+                    number = server.requests
+                    server._in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server._in_flight)
+                try:
+                    if server.rate_limit_every and number % server.rate_limit_every == 0:
+                        with server._lock:
+                            server.rate_limited += 1
+                        self._reply(429, {'error': {'message': 'rate limited'}},
+                                    {'Retry-After': str(server.retry_after)})
+                        return
+                    if server.latency:
+                        time.sleep(server.latency)
+                    self._reply(200, server.completion(json.loads(body or b'{}')))
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+            def _reply(self, status: int, data: Dict[str, Any],
+                       headers: Optional[Dict[str, str]] = None) -> None:
+                encoded = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(encoded)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self.base_url = f'http://{host}:{self.port}/v1'
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-llm', daemon=True)
+
+    @staticmethod
+    def completion(request: Dict[str, Any]) -> Dict[str, Any]:
+        messages = request.get('messages') or [{}]
+        prompt = ''.join(str(message.get('content', '')) for message in messages)
+        content = f"echo: {messages[-1].get('content', '')}"
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        return {
+            'id': f'fake-{time.time_ns()}',
+            'object': 'chat.completion',
+            'model': request.get('model', 'fake'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                         'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens}
+        }
+
+    def start(self) -> 'FakeLLMServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Fake OpenAI-compatible LLM server')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each response')
+    parser.add_argument('--rate-limit-every', type=int, default=0,
+                        help='Answer every Nth request with 429 (default: never)')
+    parser.add_argument('--retry-after', type=float, default=0.05, help='Retry-After seconds sent with 429')
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.port, args.host, args.latency, args.rate_limit_every, args.retry_after)
+    server.start()
+    print(f'Fake LLM server listening on {server.base_url}')
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Dict, Any, List, Optional
+
+from llm.provider import LLMProvider, Message
+from utils.metrics import REGISTRY
+
+LLM_CACHE_LOOKUPS = REGISTRY.counter('agent_llm_cache_lookups_total', 'LLM response cache lookups', ('result',))
+LLM_CACHE_LOOKUP_SECONDS = REGISTRY.histogram('agent_llm_cache_lookup_seconds', 'LLM response cache lookup duration')
+LLM_CACHE_SAVED_SECONDS = REGISTRY.counter('agent_llm_cache_saved_seconds_total',
+                                           'Model latency avoided by LLM response cache hits')
+LLM_CACHE_SAVED_TOKENS = REGISTRY.counter('agent_llm_cache_saved_tokens_total',
+                                          'Model tokens avoided by LLM response cache hits')
+LLM_CACHE_COALESCED = REGISTRY.counter('agent_llm_cache_coalesced_total',
+                                      'Concurrent identical LLM requests answered by a single model call')
+
+DEFAULT_PROMPT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', 'cache', 'llm_responses.sqlite3')
+
+_TRAILING_SPACE = re.compile(r'[ \t]+\n')
+
+def normalize_text(text: str) -> str:
+    """NFC 规范化、统一换行、去掉行尾和首尾空白，只影响不改变语义的差异"""
+    text = unicodedata.normalize('NFC', text).replace('\r\n', '\n').replace('\r', '\n')
+    return _TRAILING_SPACE.sub('\n', text).strip()
+
+def prompt_key(messages: List[Message], model: str, max_tokens: int, temperature: float) -> str:
+    """规范化后的提示词与生成参数的摘要"""
+    canonical = json.dumps({
+        'model': model,
+        'messages': [{'role': message.get('role', 'user'), 'content': normalize_text(message.get('content', ''))}
+                     for message in messages],
+        'max_tokens': max_tokens,
+        'temperature': round(float(temperature), 4)
+    }, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class PromptCache:
+    """模型响应的持久化缓存（SQLite WAL，多个工作进程可以共享），按条数、总大小和存活时间淘汰"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024, max_age: float = 7 * 24 * 3600):
+        self.path = os.path.abspath(path or DEFAULT_PROMPT_CACHE_PATH)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # 缓存丢失最近几次写入没有影响，WAL 下 NORMAL 不会损坏数据库，省去每次提交的 fsync
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                latency REAL NOT NULL,
+                tokens INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的响应，过期或不存在时返回 None"""
+        with LLM_CACHE_LOOKUP_SECONDS.time():
+            now = time.time()
+            row = self._db.execute(
+                'SELECT response, latency, tokens FROM responses WHERE key = ? AND created_at >= ?',
+                (key, now - self.max_age)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                LLM_CACHE_LOOKUPS.inc(result='miss')
+                return None
+            self._db.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+
+        self.record_hit(row[1], row[2])
+        return json.loads(row[0])
+
+    def record_hit(self, latency: float, tokens: int) -> None:
+        """统计一次命中（也用于合并到进行中请求的调用），latency 和 tokens 计入节省的量"""
+        self.hits += 1
+        LLM_CACHE_LOOKUPS.inc(result='hit')
+        LLM_CACHE_SAVED_SECONDS.inc(latency)
+        LLM_CACHE_SAVED_TOKENS.inc(tokens)
+
+    def put(self, key: str, response: Dict[str, Any], latency: float) -> None:
+        """保存响应（latency 为模型调用耗时，命中时计入节省的时间）并执行淘汰"""
+        data = json.dumps(response, ensure_ascii=False)
+        tokens = int((response.get('usage') or {}).get('total_tokens', 0))
+        now = time.time()
+        self._db.execute(
+            'INSERT OR REPLACE INTO responses (key, response, size, latency, tokens, created_at, last_access) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (key, data, len(data.encode('utf-8')), latency, tokens, now, now)
+        )
+        self.evict()
+
+    def evict(self) -> None:
+        """删除过期条目，再按最近访问时间淘汰超出条数或大小上限的条目"""
+        self._db.execute('DELETE FROM responses WHERE created_at < ?', (time.time() - self.max_age,))
+
+        count, total = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        for key, size in self._db.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            count -= 1
+            total -= size
+
+    def close(self) -> None:
+        self._db.close()
+
+class _LeaderCancelled(Exception):
+    """合并请求中实际调用模型的调用被取消，等待者需要自己重新发起"""
+
+class CachedProvider(LLMProvider):
+    """在提供方前加一层响应缓存：完全相同的（规范化后的）请求直接返回缓存的响应
+
+    同一进程内并发的相同请求只调用一次模型，合并的调用按命中统计；实际调用模型的请求被取消时，
+    其余等待者中的一个接手重新调用，取消不会传递给它们。命中的响应带 cached: True。
+    """
+
+    def __init__(self, provider: LLMProvider, cache: PromptCache):
+        self.provider = provider
+        self.cache = cache
+        self.model = getattr(provider, 'model', '')
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def complete(self, messages: List[Message], max_tokens: int = 1024,
+                       temperature: float = 0.2, model: Optional[str] = None) -> Dict[str, Any]:
+        key = prompt_key(messages, model or self.model, max_tokens, temperature)
+        while True:
+            # 先检查进行中的请求，合并的调用不计为未命中
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                try:
+                    response, latency = await asyncio.shield(inflight)
+                except _LeaderCancelled:
+                    continue
+                LLM_CACHE_COALESCED.inc()
+                self.cache.record_hit(latency, int((response.get('usage') or {}).get('total_tokens', 0)))
+                return {**response, 'cached': True}
+
+            cached = self.cache.get(key)
+            if cached is not None:
+                return {**cached, 'cached': True}
+            return await self._lead(key, messages, max_tokens, temperature, model)
+
+    async def _lead(self, key: str, messages: List[Message], max_tokens: int,
+                    temperature: float, model: Optional[str]) -> Dict[str, Any]:
+        """调用模型并把结果（响应和耗时）交给同一键上的等待者"""
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            started = time.perf_counter()
+            response = await self.provider.complete(messages, max_tokens, temperature, model)
+            latency = time.perf_counter() - started
+            self.cache.put(key, response, latency)
+            future.set_result((response, latency))
+            return response
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其它等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def aclose(self) -> None:
+        await self.provider.aclose()
+        self.cache.close()
@@ -0,0 +1,199 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Any, List, Optional
+
+from llm.rate_limit import RateLimiter
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+
+LLM_REQUESTS = REGISTRY.counter('agent_llm_requests_total', 'LLM HTTP requests by result', ('result',))
+LLM_TOKENS = REGISTRY.counter('agent_llm_tokens_total', 'LLM tokens used', ('kind',))
+LLM_REQUEST_SECONDS = REGISTRY.histogram('agent_llm_request_seconds', 'LLM HTTP request duration')
+
+# 可重试的状态码：限流和服务端临时错误
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+Message = Dict[str, str]
+
+class LLMError(Exception):
+    """模型调用失败"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 token 数：ASCII 约 4 个字符一个 token，其它字符（中文等）约一个字符一个 token"""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+def retry_delay(attempt: int, base: float = 0.5, cap: float = 30.0,
+                retry_after: Optional[float] = None) -> float:
+    """第 attempt 次重试前的等待秒数：指数退避加全抖动；服务端给出 Retry-After 时在它之上加最多 20% 的抖动"""
+    if retry_after is not None:
+        return min(cap, retry_after * (1 + random.uniform(0, 0.2)))
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class LLMProvider:
+    """模型提供方接口，角色只依赖 complete"""
+
+    async def complete(self, messages: List[Message], max_tokens: int = 1024,
+                       temperature: float = 0.2, model: Optional[str] = None) -> Dict[str, Any]:
+        """返回 {'content': 文本, 'model': 模型名, 'usage': {'prompt_tokens', 'completion_tokens', 'total_tokens'}}"""
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        pass
+
+class OpenAICompatibleProvider(LLMProvider):
+    """OpenAI 兼容的 /chat/completions 接口
+
+    整个进程共用一个 keep-alive 连接池（aiohttp 在第一次请求时才导入并创建会话），
+    所有请求经过同一个 RateLimiter；429 和 5xx 按指数退避加抖动重试，429 同时暂停所有请求。
+    """
+
+    def __init__(self, base_url: str = 'https://api.openai.com/v1', api_key: Optional[str] = None,
+                 model: str = 'gpt-3.5-turbo', limiter: Optional[RateLimiter] = None,
+                 max_retries: int = 5, retry_base: float = 0.5, retry_cap: float = 30.0,
+                 timeout: float = 60.0, pool_size: int = 64):
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.api_key = api_key
+        self.model = model
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.logger = setup_logger('llm_provider')
+        self._session: Optional[Any] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def _get_session(self) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            import aiohttp
+            stale = self._session
+            headers = {'Authorization': f'Bearer {self.api_key}'} if self.api_key else {}
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=30),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers=headers
+            )
+            self._session_loop = loop
+            # 新会话就位后再关闭上一个事件循环留下的会话，等待关闭期间的并发调用不会再各自创建会话
+            await _close_session(stale)
+        return self._session
+
+    async def complete(self, messages: List[Message], max_tokens: int = 1024,
+                       temperature: float = 0.2, model: Optional[str] = None) -> Dict[str, Any]:
+        body = {
+            'model': model or self.model,
+            'messages': messages,
+            'max_tokens': max_tokens,
+            'temperature': temperature
+        }
+        estimated = sum(estimate_tokens(message.get('content', '')) for message in messages) + max_tokens
+        session = await self._get_session()
+        import aiohttp
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            async with self.limiter.slot(estimated):
+                started = time.perf_counter()
+                try:
+                    async with session.post(self.url, json=body) as response:
+                        status = response.status
+                        if status == 200:
+                            data = await response.json()
+                        else:
+                            text = await response.text()
+                            retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                except asyncio.TimeoutError:
+                    status, text = 504, 'request timed out'
+                except aiohttp.ClientConnectionError as e:
+                    status, text = 503, f'connection error: {str(e)}'
+                finally:
+                    LLM_REQUEST_SECONDS.observe(time.perf_counter() - started)
+
+            if status == 200:
+                LLM_REQUESTS.inc(result='ok')
+                return self._parse(data, estimated)
+
+            retryable = status in RETRY_STATUSES and attempt < self.max_retries
+            LLM_REQUESTS.inc(result='retry' if retryable else 'error')
+            if not retryable:
+                raise LLMError(f'LLM request failed with status {status}: {text[:200]}', status)
+
+            delay = retry_delay(attempt, self.retry_base, self.retry_cap, retry_after)
+            if status == 429:
+                self.limiter.pause(delay)
+            self.logger.warning(f"LLM request got status {status}, retrying in {delay:.2f}s (attempt {attempt + 1})")
+            await asyncio.sleep(delay)
+
+        raise LLMError('LLM request retries exhausted')
+
+    def _parse(self, data: Dict[str, Any], estimated: int) -> Dict[str, Any]:
+        try:
+            content = data['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError):
+            raise LLMError('Malformed LLM response') from None
+        usage = data.get('usage') or {}
+        total = usage.get('total_tokens', estimated)
+        self.limiter.settle(estimated, total)
+        LLM_TOKENS.inc(usage.get('prompt_tokens', 0), kind='prompt')
+        LLM_TOKENS.inc(usage.get('completion_tokens', 0), kind='completion')
+        return {'content': content, 'model': data.get('model', self.model), 'usage': usage}
+
+    async def aclose(self) -> None:
+        session, self._session = self._session, None
+        await _close_session(session)
+
+async def _close_session(session: Optional[Any]) -> None:
+    if session is not None and not session.closed:
+        await session.close()
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+_default_provider: Optional[LLMProvider] = None
+
+def get_provider() -> LLMProvider:
+    """进程内共享的提供方，角色都应通过它调用模型而不是各自创建会话
+
+    配置来自环境变量 LLM_BASE_URL、LLM_API_KEY（或 OPENAI_API_KEY）、LLM_MODEL、
+    LLM_REQUESTS_PER_MINUTE、LLM_TOKENS_PER_MINUTE 和 LLM_MAX_CONCURRENCY。
+    响应默认经过持久化缓存（LLM_CACHE=0 关闭，LLM_CACHE_PATH 和 LLM_CACHE_TTL 指定位置和存活秒数）。
+    """
+    global _default_provider
+    if _default_provider is None:
+        env = os.environ
+        provider: LLMProvider = OpenAICompatibleProvider(
+            base_url=env.get('LLM_BASE_URL', 'https://api.openai.com/v1'),
+            api_key=env.get('LLM_API_KEY') or env.get('OPENAI_API_KEY'),
+            model=env.get('LLM_MODEL', 'gpt-3.5-turbo'),
+            limiter=RateLimiter(
+                requests_per_minute=float(env.get('LLM_REQUESTS_PER_MINUTE', 60)),
+                tokens_per_minute=float(env.get('LLM_TOKENS_PER_MINUTE', 90000)),
+                max_concurrency=int(env.get('LLM_MAX_CONCURRENCY', 8))
+            )
+        )
+        if env.get('LLM_CACHE', '1') != '0':
+            from llm.prompt_cache import CachedProvider, PromptCache
+            provider = CachedProvider(provider, PromptCache(
+                env.get('LLM_CACHE_PATH'), max_age=float(env.get('LLM_CACHE_TTL', 7 * 24 * 3600))
+            ))
+        _default_provider = provider
+    return _default_provider
+
+async def close_provider() -> None:
+    """关闭共享提供方的连接池"""
+    global _default_provider
+    if _default_provider is not None:
+        await _default_provider.aclose()
+        _default_provider = None
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, AsyncIterator, Callable
+
+class TokenBucket:
+    """令牌桶：最多存 capacity 个令牌，每秒补充 rate 个
+
+    acquire 按先来先到的顺序等待；超过容量的请求在桶满时放行（记为欠账），
+    adjust 可以在知道实际用量后补扣或退还令牌，余额允许为负。
+    令牌余额在整个进程内共享，等待用的锁按事件循环分别创建（--batch 的 worker 每个任务块运行一个新循环）。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def tokens(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        needed = min(amount, self.capacity)
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """amount 为正时补扣令牌，为负时退还"""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - amount)
+
+class RateLimiter:
+    """进程内共享的请求限流：每分钟请求数、每分钟 token 数和最大并发数
+
+    收到 429 时调用 pause，所有请求在暂停结束前都不会发出。
+    """
+
+    def __init__(self, requests_per_minute: float = 60.0, tokens_per_minute: float = 90_000.0,
+                 max_concurrency: int = 8):
+        self.requests = TokenBucket(requests_per_minute / 60.0, capacity=max(1.0, requests_per_minute / 60.0))
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, capacity=tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        # 并发名额在第一次使用时按当前事件循环创建，换了循环时重新创建
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._resume_at = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int) -> AsyncIterator[None]:
+        """占用一个并发名额，并按预估的 token 数扣减令牌"""
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        async with self._slots:
+            while True:
+                delay = self._resume_at - time.monotonic()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            yield
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """按实际用量修正 token 令牌桶"""
+        self.tokens.adjust(actual_tokens - estimated_tokens)
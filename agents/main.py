@@ -4,19 +4,24 @@ import sys
 import argparse
 import time
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-from workflows.project_workflow import ProjectWorkflow
-from utils.logger import setup_logger
-from utils.message_sender import MessageSender
+# 这里只导入启动和发送第一条消息所需的模块；工作流、角色、常驻和批量模式在用到时才导入
+from utils.logger import setup_logger, configure_logging
+from utils.message_sender import MessageSender, open_stdout_channel
+from utils.compression import create_compressor
 
 class ProjectAgent:
-    def __init__(self, project_id: str, config: Dict[str, Any]):
+    def __init__(self, project_id: str, config: Dict[str, Any],
+                 message_sender: Optional[MessageSender] = None,
+                 workflow_options: Optional[Dict[str, Any]] = None):
         self.project_id = project_id
         self.config = config
-        self.logger = setup_logger(project_id)
-        self.message_sender = MessageSender()
-        self.workflow = ProjectWorkflow(project_id, config, self.message_sender)
+        self.logger = setup_logger(project_id, project_id=project_id)
+        self.message_sender = message_sender or MessageSender()
+        self.workflow_options = workflow_options or {}
+        # 在发送第一条进度消息之后才创建
+        self.workflow = None
 
     async def start_development(self) -> None:
         """开始软件开发流程"""
@@ -34,17 +39,30 @@ class ProjectAgent:
             })
 
             # 执行完整的开发工作流
+            self.workflow = self._create_workflow()
             await self.workflow.execute()
 
             # 发送完成消息
+            payload = {
+                'stage': 'completed',
+                'progress': 100,
+                'message': '项目开发完成',
+                'files_generated': self.workflow.get_generated_files(),
+                'workspace': self.workflow.workspace.run_id,
+                'manifestPath': self.workflow.manifest_path
+            }
+            # 完整清单（含规范化配置和各阶段输出）只在增量运行时随完成消息发送，其余情况从工作区读取
+            if self.workflow_options.get('previous_manifest'):
+                payload['manifest'] = self.workflow.get_manifest()
+            if self.workflow.cache_hit:
+                payload['cached'] = True
+            if self.workflow.resumed:
+                payload['resumed'] = True
+            if self.workflow.pacer.mode == 'virtual':
+                payload['simulatedSeconds'] = self.workflow.pacer.elapsed
             await self.message_sender.send_message({
                 'type': 'progress',
-                'payload': {
-                    'stage': 'completed',
-                    'progress': 100,
-                    'message': '项目开发完成',
-                    'files_generated': self.workflow.get_generated_files()
-                }
+                'payload': payload
             })
 
             self.logger.info(f"Development completed for project {self.project_id}")
@@ -60,32 +78,216 @@ class ProjectAgent:
             })
             raise
 
+    def _create_workflow(self) -> Any:
+        from workflows.project_workflow import ProjectWorkflow
+        return ProjectWorkflow(self.project_id, self.config, self.message_sender, **self.workflow_options)
+
+def workflow_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """从命令行参数构造工作流选项"""
+    return {
+        'file_concurrency': args.file_concurrency,
+        'pacing': args.pacing,
+        'chunk_threshold': args.chunk_threshold,
+        'dedup': args.dedup,
+        'use_cache': not args.no_cache,
+        'trace': args.trace,
+        'profile': args.profile,
+        'profile_dir': args.profile_dir,
+        'profile_sample_rate': args.profile_rate,
+        'workspace_dir': args.workspace_dir,
+        'workspace_keep_runs': args.workspace_keep_runs,
+        'artifact_dir': args.artifact_dir,
+        'checkpoint_dir': args.checkpoint_dir,
+        'resume': args.resume,
+        'stream_files': args.stream_files
+    }
+
+async def serve(args: argparse.Namespace) -> None:
+    """常驻模式：在同一进程中并发处理多个项目任务"""
+    from workflows.daemon import AgentDaemon, job_workflow_options
+
+    options = workflow_options(args)
+    message_sender = MessageSender(channel=await open_stdout_channel(args.coalesce_progress))
+    message_sender.channel.compressor = create_compressor(args.compress, args.compress_threshold)
+    daemon = AgentDaemon(
+        lambda project_id, config, sender, job: ProjectAgent(
+            project_id, config, sender, job_workflow_options(options, job)
+        ),
+        message_sender,
+        max_concurrency=args.max_concurrency,
+        coalesce_progress=args.coalesce_progress,
+        compress=args.compress,
+        compress_threshold=args.compress_threshold,
+        artifact_dir=args.artifact_dir
+    )
+    try:
+        if args.socket:
+            await daemon.serve_socket(args.socket)
+        else:
+            await daemon.serve_stdin()
+    finally:
+        await daemon.shutdown()
+        await daemon.message_sender.aclose()
+
+async def batch(args: argparse.Namespace) -> int:
+    """批量模式：用进程池运行任务文件中的所有项目，返回退出码"""
+    from workflows.batch import BatchRunner, load_jobs
+
+    message_sender = MessageSender()
+    jobs, errors = load_jobs(args.batch)
+    for message in errors:
+        await message_sender.send_message({
+            'type': 'error',
+            'payload': {
+                'message': message
+            }
+        })
+
+    runner = BatchRunner(ProjectAgent, workflow_options(args), workers=args.workers,
+                         worker_concurrency=args.worker_concurrency,
+                         compress=args.compress, compress_threshold=args.compress_threshold,
+                         # 开启指标导出时汇总工作进程的指标
+                         metrics_interval=(args.metrics_interval if args.metrics_port is not None
+                                           or args.metrics_file else None))
+    summary = await runner.run(jobs)
+    await message_sender.send_message({
+        'type': 'batch_summary',
+        'payload': summary
+    })
+    return 1 if errors or summary['failed'] else 0
+
 async def main():
     parser = argparse.ArgumentParser(description='AI Development Team Agent')
-    parser.add_argument('--project-id', required=True, help='Project ID')
-    parser.add_argument('--config', required=True, help='Project configuration JSON')
+    parser.add_argument('--project-id', help='Project ID')
+    parser.add_argument('--config', help='Project configuration JSON')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run as a long-lived daemon reading JSON-line jobs from stdin')
+    parser.add_argument('--batch', metavar='JOBS_JSONL',
+                        help='Run every job in a JSON-lines file across a process pool, then report a batch_summary')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes for --batch (default: CPU count)')
+    parser.add_argument('--worker-concurrency', type=int, default=4,
+                        help='Maximum number of projects running at once in each --batch worker')
+    parser.add_argument('--socket', help='Unix socket path to accept jobs on instead of stdin (with --serve)')
+    parser.add_argument('--max-concurrency', type=int, default=8,
+                        help='Maximum number of projects running at once (with --serve)')
+    parser.add_argument('--file-concurrency', type=int, default=4,
+                        help='Maximum number of code files generated at once per project')
+    parser.add_argument('--pacing', choices=['real', 'none', 'virtual'], default='real',
+                        help='Simulated work pacing: real waits, none skips waits, virtual uses a virtual clock')
+    parser.add_argument('--chunk-threshold', type=int, default=256 * 1024,
+                        help='Files larger than this many characters are streamed as file_begin/file_chunk/file_end')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Send content already known to the consumer as a contentHash reference. '
+                             'Only useful with --serve, where consumers declare known_blobs and can fetch_blob; '
+                             'a single-project run (how the backend spawns agents) starts with no known hashes, '
+                             'so only content repeated within that run is replaced by references')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Bypass the whole-workflow result cache')
+    parser.add_argument('--previous-manifest',
+                        help="Path to a previous run's manifest JSON (the workspace's .manifest.json); "
+                             "only artifacts affected by changed config fields are regenerated")
+    parser.add_argument('--workspace-dir',
+                        help='Directory for per-run workspaces that generated files are written to (default: agents/workspaces)')
+    parser.add_argument('--workspace-keep-runs', type=int, default=5,
+                        help='Number of most recent run workspaces kept per project; older ones are deleted (default: 5)')
+    parser.add_argument('--artifact-dir',
+                        help='Directory of the content-addressed artifact store (default: agents/.artifacts)')
+    parser.add_argument('--checkpoint-dir',
+                        help='Directory for per-project stage checkpoints (default: agents/checkpoints)')
+    parser.add_argument('--stream-files', action='store_true',
+                        help='Stream code files as file_partial messages while they are generated; '
+                             'the final file_generated carries contentHash and size instead of content')
+    parser.add_argument('--compress', nargs='?', const='zlib', metavar='ENCODINGS',
+                        help='Compress large file contents in messages; ENCODINGS lists accepted encodings '
+                             'in preference order, e.g. zstd,zlib (default: zlib). Daemon clients can negotiate with a hello job instead')
+    parser.add_argument('--compress-threshold', type=int, default=4096,
+                        help='Minimum UTF-8 size in bytes of a field before it is compressed')
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue from the project's last checkpoint: finished stages and files are re-sent by reference")
+    parser.add_argument('--coalesce-progress', action='store_true',
+                        help='Collapse consecutive progress messages of the same stage into the latest one')
+    parser.add_argument('--trace', action='store_true',
+                        help='Emit a metrics message (wall/CPU time, messages, bytes) per stage and a summary at completion')
+    parser.add_argument('--profile', nargs='?', const='full', choices=['full', 'sample'],
+                        help='Profile each stage: full writes cProfile .prof and tracemalloc reports (stages run serially), '
+                             'sample records low-overhead stack samples')
+    parser.add_argument('--profile-rate', type=float, default=100.0,
+                        help='Samples per second for --profile sample')
+    parser.add_argument('--profile-dir', help='Directory for profile reports (default: agents/profiles)')
+    parser.add_argument('--log-format', choices=['text', 'json'], default='text',
+                        help='text writes one rotating file per logger; json writes a JSON-lines log keyed by projectId '
+                             '(agents.jsonl, plus agents-<pid>.jsonl for each --batch worker)')
+    parser.add_argument('--max-open-logs', type=int, default=32,
+                        help='Maximum number of log files kept open at once (text log format)')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-file',
+                        help='Write Prometheus metrics to this file for the node_exporter textfile collector')
+    parser.add_argument('--metrics-interval', type=float, default=15.0,
+                        help='Seconds between --metrics-file writes')
+    parser.add_argument('--log-dir', help='Directory for log files (default: agents/logs)')
     args = parser.parse_args()
+    configure_logging(args.log_format, max_open=args.max_open_logs, log_dir=args.log_dir)
 
+    exporters = []
+    if args.metrics_port is not None or args.metrics_file:
+        from utils.metrics import MetricsHTTPServer, TextfileWriter
+    if args.metrics_port is not None:
+        exporters.append(MetricsHTTPServer(args.metrics_port).start())
+    if args.metrics_file:
+        exporters.append(TextfileWriter(args.metrics_file, args.metrics_interval).start())
+    try:
+        await run(args, parser)
+    finally:
+        for exporter in exporters:
+            exporter.stop()
+
+async def run(args: argparse.Namespace, parser: argparse.ArgumentParser) -> None:
+    """按命令行参数选择常驻、批量或单项目模式运行"""
+    if args.serve:
+        await serve(args)
+        return
+    if args.batch:
+        exit_code = await batch(args)
+        if exit_code:
+            sys.exit(exit_code)
+        return
+    if not args.project_id or not args.config:
+        parser.error('--project-id and --config are required unless --serve or --batch is given')
+
+    message_sender = MessageSender(channel=await open_stdout_channel(args.coalesce_progress))
+    message_sender.channel.compressor = create_compressor(args.compress, args.compress_threshold)
+    exit_code = 0
     try:
         config = json.loads(args.config)
-        agent = ProjectAgent(args.project_id, config)
+        options = workflow_options(args)
+        if args.previous_manifest:
+            with open(args.previous_manifest, 'r', encoding='utf-8') as f:
+                options['previous_manifest'] = json.load(f)
+        agent = ProjectAgent(args.project_id, config, message_sender, options)
         await agent.start_development()
     except json.JSONDecodeError as e:
-        print(json.dumps({
+        await message_sender.send_message({
             'type': 'error',
             'payload': {
                 'message': f'Invalid configuration JSON: {str(e)}'
             }
-        }), flush=True)
-        sys.exit(1)
+        })
+        exit_code = 1
     except Exception as e:
-        print(json.dumps({
+        await message_sender.send_message({
             'type': 'error',
             'payload': {
                 'message': f'Agent execution failed: {str(e)}'
             }
-        }), flush=True)
-        sys.exit(1)
+        })
+        exit_code = 1
+    finally:
+        await message_sender.aclose()
+
+    if exit_code:
+        sys.exit(exit_code)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
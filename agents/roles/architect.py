@@ -1,37 +1,46 @@
-import asyncio
-import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional, FrozenSet
 from utils.message_sender import MessageSender
 from utils.logger import setup_logger
+from utils.pacing import Pacer, RealPacer
+from utils.tracing import NULL_TRACER, traced
+from utils.keyword_index import apply_rules
+from roles.keyword_rules import KEYWORD_INDEX, DATABASE_TABLE_RULES, API_ENDPOINT_RULES
 
 class CustomArchitect:
     """自定义架构师角色"""
     
-    def __init__(self, project_id: str, message_sender: MessageSender):
+    def __init__(self, project_id: str, message_sender: MessageSender, pacer: Optional[Pacer] = None,
+                 tracer: Any = NULL_TRACER):
         self.project_id = project_id
         self.message_sender = message_sender
-        self.logger = setup_logger(f"{project_id}_architect")
+        self.pacer = pacer or RealPacer()
+        self.tracer = tracer
+        self.logger = setup_logger(f"{project_id}_architect", project_id=project_id)
         self.role_name = "Architect"
 
-    async def design_system(self, project_type: str, description: str) -> Dict[str, Any]:
-        """设计系统架构"""
+    @traced('architect.design_system')
+    async def design_system(self, project_type: str, description: str,
+                            matches: Optional[FrozenSet[str]] = None) -> Dict[str, Any]:
+        """设计系统架构，matches 为描述的关键词命中集合（未提供时扫描一次描述）"""
         await self.send_status_update("开始系统架构设计...")
         
         # 模拟架构设计过程
-        await asyncio.sleep(1)
+        await self.pacer.pause(1, 'architect.design')
         
         await self.send_status_update("分析技术栈选型...")
         
         # 根据项目类型选择合适的架构
+        if matches is None:
+            matches = KEYWORD_INDEX.scan(description)
         architecture = {
             'pattern': self._select_architecture_pattern(project_type),
             'tech_stack': self._select_tech_stack(project_type),
-            'database_design': self._design_database(description),
-            'api_design': self._design_api(description),
+            'database_design': self._design_database(matches),
+            'api_design': self._design_api(matches),
             'deployment': self._design_deployment(project_type)
         }
         
-        await asyncio.sleep(1)
+        await self.pacer.pause(1, 'architect.tech_stack')
         await self.send_status_update("系统架构设计完成")
         
         self.logger.info(f"System architecture designed for project {self.project_id}")
@@ -72,19 +81,12 @@ class CustomArchitect:
                 'deployment': '可执行文件'
             }
 
-    def _design_database(self, description: str) -> Dict[str, Any]:
+    def _design_database(self, matches: FrozenSet[str]) -> Dict[str, Any]:
         """设计数据库结构"""
         tables = ['users']  # 基础用户表
         
         # 根据描述添加相关表
-        if "项目" in description or "任务" in description:
-            tables.extend(['projects', 'tasks'])
-        if "文件" in description:
-            tables.append('files')
-        if "日志" in description or "记录" in description:
-            tables.append('logs')
-        if "评论" in description or "反馈" in description:
-            tables.append('comments')
+        tables.extend(apply_rules(DATABASE_TABLE_RULES, matches))
         
         return {
             'type': 'PostgreSQL',
@@ -93,7 +95,7 @@ class CustomArchitect:
             'constraints': ['foreign_key_constraints', 'unique_constraints']
         }
 
-    def _design_api(self, description: str) -> Dict[str, Any]:
+    def _design_api(self, matches: FrozenSet[str]) -> Dict[str, Any]:
         """设计API接口"""
         endpoints = [
             'GET /api/health',
@@ -103,20 +105,7 @@ class CustomArchitect:
         ]
         
         # 根据描述添加相关API
-        if "项目" in description:
-            endpoints.extend([
-                'GET /api/projects',
-                'POST /api/projects',
-                'GET /api/projects/:id',
-                'PUT /api/projects/:id',
-                'DELETE /api/projects/:id'
-            ])
-        if "文件" in description:
-            endpoints.extend([
-                'GET /api/files',
-                'POST /api/files/upload',
-                'GET /api/files/:id/download'
-            ])
+        endpoints.extend(apply_rules(API_ENDPOINT_RULES, matches))
         
         return {
             'style': 'RESTful',
@@ -156,7 +145,7 @@ class CustomArchitect:
             'payload': {
                 'agent': self.role_name,
                 'message': message,
-                'timestamp': time.time()
+                'timestamp': self.pacer.now()
             }
         })
         self.logger.info(f"Architect Status: {message}")
\ No newline at end of file
@@ -1,450 +1,199 @@
 import asyncio
-import time
-from typing import Dict, List, Any
+from dataclasses import dataclass
+from typing import Dict, List, Any, AsyncIterator, Callable, Iterator, Optional, Set, Tuple, Union
 from utils.message_sender import MessageSender
 from utils.logger import setup_logger
+from utils.pacing import Pacer, RealPacer
+from utils.tracing import NULL_TRACER, traced
+from utils.template_engine import get_template_engine
+
+@dataclass
+class FileSpec:
+    """待生成的代码文件"""
+    file_name: str
+    file_path: str
+    file_type: str
+    # render(description, stream=False)：stream 为 True 时返回逐段产出内容的迭代器
+    render: Callable[..., Union[str, Iterator[str]]]
+    # 影响文件内容的项目配置字段，用于增量重新生成
+    inputs: Tuple[str, ...] = ('projectType', 'description')
 
 class CustomEngineer:
     """自定义工程师角色"""
     
-    def __init__(self, project_id: str, message_sender: MessageSender):
+    def __init__(self, project_id: str, message_sender: MessageSender, max_concurrency: int = 4,
+                 pacer: Optional[Pacer] = None, tracer: Any = NULL_TRACER):
         self.project_id = project_id
         self.message_sender = message_sender
-        self.logger = setup_logger(f"{project_id}_engineer")
+        self.pacer = pacer or RealPacer()
+        self.tracer = tracer
+        self.logger = setup_logger(f"{project_id}_engineer", project_id=project_id)
         self.role_name = "Engineer"
-
-    async def develop_code(self, project_type: str, description: str) -> List[Dict[str, Any]]:
-        """开发代码"""
-        await self.send_status_update("开始代码开发...")
-        
-        code_files = []
-        
+        self.templates = get_template_engine()
+        # 同时生成的文件数上限
+        self.max_concurrency = max(1, max_concurrency)
+        # 流式生成时每个片段之后的等待秒数（模拟逐 token 输出）
+        self.fragment_pause = 0.1
+
+    def plan_files(self, project_type: str) -> List[Tuple[str, List[FileSpec]]]:
+        """按项目类型规划需要生成的文件，返回 (状态消息, 文件列表) 分组"""
         if project_type == 'web_app':
-            code_files.extend(await self._develop_web_app(description))
+            return [
+                ("生成前端组件...", [
+                    # 主应用文件
+                    FileSpec('App.vue', '/src/App.vue', 'vue', self._generate_vue_app),
+                    # 主页面组件
+                    FileSpec('HomePage.vue', '/src/views/HomePage.vue', 'vue', self._generate_home_page),
+                ]),
+                ("生成后端API...", [
+                    # 后端主文件
+                    FileSpec('server.js', '/backend/server.js', 'javascript', self._generate_server_js),
+                    # 数据库模型
+                    FileSpec('models.js', '/backend/models.js', 'javascript', self._generate_models,
+                             inputs=('projectType',)),
+                ]),
+            ]
         elif project_type == 'api':
-            code_files.extend(await self._develop_api(description))
+            return [
+                ("生成API路由...", [
+                    # API主文件
+                    FileSpec('app.js', '/src/app.js', 'javascript', self._generate_api_app),
+                    # 路由文件
+                    FileSpec('routes.js', '/src/routes.js', 'javascript', self._generate_api_routes,
+                             inputs=('projectType',)),
+                ]),
+            ]
         else:  # script
-            code_files.extend(await self._develop_script(description))
-        
-        await self.send_status_update("代码开发完成")
-        
-        self.logger.info(f"Code development completed for project {self.project_id}")
-        return code_files
+            return [
+                ("生成脚本文件...", [
+                    # 主脚本文件
+                    FileSpec('main.py', '/src/main.py', 'python', self._generate_python_script),
+                    # 配置文件
+                    FileSpec('config.py', '/src/config.py', 'python',
+                             lambda _, stream=False: self._generate_config_file(stream),
+                             inputs=('projectType',)),
+                ]),
+            ]
+
+    def file_specs(self, project_type: str) -> List[FileSpec]:
+        """项目类型对应的所有文件"""
+        return [spec for _, specs in self.plan_files(project_type) for spec in specs]
+
+    def count_files(self, project_type: str) -> int:
+        """项目类型对应的文件数量"""
+        return len(self.file_specs(project_type))
 
-    async def _develop_web_app(self, description: str) -> List[Dict[str, Any]]:
-        """开发Web应用"""
-        await self.send_status_update("生成前端组件...")
-        await asyncio.sleep(1)
-        
-        files = []
-        
-        # 主应用文件
-        files.append({
-            'fileName': 'App.vue',
-            'filePath': '/src/App.vue',
-            'content': self._generate_vue_app(description),
-            'fileType': 'vue',
-            'createdBy': 'Engineer'
-        })
-        
-        # 主页面组件
-        files.append({
-            'fileName': 'HomePage.vue',
-            'filePath': '/src/views/HomePage.vue',
-            'content': self._generate_home_page(description),
-            'fileType': 'vue',
-            'createdBy': 'Engineer'
-        })
-        
-        await self.send_status_update("生成后端API...")
-        await asyncio.sleep(1)
-        
-        # 后端主文件
-        files.append({
-            'fileName': 'server.js',
-            'filePath': '/backend/server.js',
-            'content': self._generate_server_js(description),
-            'fileType': 'javascript',
-            'createdBy': 'Engineer'
-        })
-        
-        # 数据库模型
-        files.append({
-            'fileName': 'models.js',
-            'filePath': '/backend/models.js',
-            'content': self._generate_models(description),
-            'fileType': 'javascript',
-            'createdBy': 'Engineer'
-        })
-        
-        return files
-
-    async def _develop_api(self, description: str) -> List[Dict[str, Any]]:
-        """开发API服务"""
-        await self.send_status_update("生成API路由...")
-        await asyncio.sleep(1)
-        
-        files = []
-        
-        # API主文件
-        files.append({
-            'fileName': 'app.js',
-            'filePath': '/src/app.js',
-            'content': self._generate_api_app(description),
-            'fileType': 'javascript',
-            'createdBy': 'Engineer'
-        })
-        
-        # 路由文件
-        files.append({
-            'fileName': 'routes.js',
-            'filePath': '/src/routes.js',
-            'content': self._generate_api_routes(description),
-            'fileType': 'javascript',
-            'createdBy': 'Engineer'
-        })
-        
-        return files
-
-    async def _develop_script(self, description: str) -> List[Dict[str, Any]]:
-        """开发脚本工具"""
-        await self.send_status_update("生成脚本文件...")
-        await asyncio.sleep(1)
-        
-        files = []
-        
-        # 主脚本文件
-        files.append({
-            'fileName': 'main.py',
-            'filePath': '/src/main.py',
-            'content': self._generate_python_script(description),
-            'fileType': 'python',
-            'createdBy': 'Engineer'
-        })
-        
-        # 配置文件
-        files.append({
-            'fileName': 'config.py',
-            'filePath': '/src/config.py',
-            'content': self._generate_config_file(),
-            'fileType': 'python',
-            'createdBy': 'Engineer'
-        })
-        
-        return files
+    async def develop_code(self, project_type: str, description: str) -> List[Dict[str, Any]]:
+        """开发代码"""
+        return [code_file async for code_file in self.iter_code(project_type, description)]
 
-    def _generate_vue_app(self, description: str) -> str:
-        """生成Vue应用主文件"""
-        return f'''<template>
-  <div id="app">
-    <el-container>
-      <el-header>
-        <h1>{{{{ title }}</h1>
-      </el-header>
-      <el-main>
-        <router-view />
-      </el-main>
-    </el-container>
-  </div>
-</template>
+    async def iter_code(self, project_type: str, description: str,
+                        only: Optional[Set[str]] = None, sink: Any = None) -> AsyncIterator[Dict[str, Any]]:
+        """并发生成所有文件（或 only 中列出的文件路径），按完成顺序逐个产出
 
-<script>
-import {{ defineComponent }} from 'vue'
+        提供 sink 时流式生成：每个文件通过 sink.open(文件信息) 得到写入器，边生成边 write 片段，
+        最后 close；产出的是 close 的返回值而不是完整文件。
+        """
+        await self.send_status_update("开始代码开发...")
 
-export default defineComponent({{
-  name: 'App',
-  data() {{
-    return {{
-      title: '{description[:20]}...'
-    }}
-  }}
-}})
-</script>
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = []
+        for status, specs in self.plan_files(project_type):
+            if only is not None:
+                specs = [spec for spec in specs if spec.file_path in only]
+                if not specs:
+                    continue
+            await self.send_status_update(status)
+            tasks.extend(
+                asyncio.create_task(
+                    self._build_file(spec, description, semaphore) if sink is None
+                    else self._stream_file(spec, description, semaphore, sink)
+                )
+                for spec in specs
+            )
 
-<style>
-#app {{
-  font-family: Avenir, Helvetica, Arial, sans-serif;
-  -webkit-font-smoothing: antialiased;
-  -moz-osx-font-smoothing: grayscale;
-  text-align: center;
-  color: #2c3e50;
-}}
-</style>'''
+        try:
+            for next_file in asyncio.as_completed(tasks):
+                yield await next_file
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
-    def _generate_home_page(self, description: str) -> str:
-        """生成首页组件"""
-        return f'''<template>
-  <div class="home">
-    <el-card>
-      <h2>欢迎使用系统</h2>
-      <p>{{{{ description }}</p>
-      <el-button type="primary" @click="handleStart">开始使用</el-button>
-    </el-card>
-  </div>
-</template>
+        await self.send_status_update("代码开发完成")
+        
+        self.logger.info(f"Code development completed for project {self.project_id}")
 
-<script>
-import {{ defineComponent }} from 'vue'
-import {{ ElMessage }} from 'element-plus'
+    @traced('engineer.build_file')
+    async def _build_file(self, spec: FileSpec, description: str,
+                          semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """生成单个文件"""
+        async with semaphore:
+            await self.pacer.pause(1, f'engineer.{spec.file_name}')
+            return {
+                'fileName': spec.file_name,
+                'filePath': spec.file_path,
+                'content': spec.render(description),
+                'fileType': spec.file_type,
+                'createdBy': 'Engineer'
+            }
 
-export default defineComponent({{
-  name: 'HomePage',
-  data() {{
-    return {{
-      description: '{description}'
-    }}
-  }},
-  methods: {{
-    handleStart() {{
-      ElMessage.success('欢迎使用!')
-    }}
-  }}
-}})
-</script>
+    @traced('engineer.stream_file')
+    async def _stream_file(self, spec: FileSpec, description: str,
+                           semaphore: asyncio.Semaphore, sink: Any) -> Any:
+        """流式生成单个文件：每个片段生成后立即交给写入器"""
+        async with semaphore:
+            writer = sink.open({
+                'fileName': spec.file_name,
+                'filePath': spec.file_path,
+                'fileType': spec.file_type,
+                'createdBy': 'Engineer'
+            })
+            try:
+                for fragment in spec.render(description, stream=True):
+                    await writer.write(fragment)
+                    await self.pacer.pause(self.fragment_pause, f'engineer.{spec.file_name}')
+                return await writer.close()
+            except BaseException:
+                writer.abort()
+                raise
+
+    def _generate_vue_app(self, description: str, stream: bool = False) -> Union[str, Iterator[str]]:
+        """生成Vue应用主文件"""
+        return self._render('engineer/vue_app', stream, title=description[:20])
 
-<style scoped>
-.home {{
-  padding: 20px;
-}}
-</style>'''
+    def _generate_home_page(self, description: str, stream: bool = False) -> Union[str, Iterator[str]]:
+        """生成首页组件"""
+        return self._render('engineer/home_page', stream, description=description)
 
-    def _generate_server_js(self, description: str) -> str:
+    def _generate_server_js(self, description: str, stream: bool = False) -> Union[str, Iterator[str]]:
         """生成服务器代码"""
-        return f'''const express = require('express')
-const cors = require('cors')
-const app = express()
-const PORT = process.env.PORT || 3001
-
-// 中间件
-app.use(cors())
-app.use(express.json())
-
-// 路由
-app.get('/api/health', (req, res) => {{
-  res.json({{ status: 'ok', message: '服务运行正常' }})
-}})
-
-app.get('/api/info', (req, res) => {{
-  res.json({{
-    name: '项目API',
-    description: '{description}',
-    version: '1.0.0'
-  }})
-}})
+        return self._render('engineer/server_js', stream, description=description)
 
-// 启动服务器
-app.listen(PORT, () => {{
-  console.log(`服务器运行在端口 ${{PORT}}`)
-}})
-
-module.exports = app'''
-
-    def _generate_models(self, description: str) -> str:
+    def _generate_models(self, description: str, stream: bool = False) -> Union[str, Iterator[str]]:
         """生成数据模型"""
-        return '''const { Sequelize, DataTypes } = require('sequelize')
-
-const sequelize = new Sequelize(process.env.DATABASE_URL || 'postgresql://localhost/database')
+        return self._render('engineer/models', stream)
 
-const User = sequelize.define('User', {
-  id: {
-    type: DataTypes.INTEGER,
-    primaryKey: true,
-    autoIncrement: true
-  },
-  username: {
-    type: DataTypes.STRING,
-    allowNull: false,
-    unique: true
-  },
-  email: {
-    type: DataTypes.STRING,
-    allowNull: false,
-    unique: true
-  },
-  createdAt: {
-    type: DataTypes.DATE,
-    defaultValue: Sequelize.NOW
-  }
-})
-
-module.exports = { sequelize, User }'''
-
-    def _generate_api_app(self, description: str) -> str:
+    def _generate_api_app(self, description: str, stream: bool = False) -> Union[str, Iterator[str]]:
         """生成API应用"""
-        return f'''const express = require('express')
-const cors = require('cors')
-const helmet = require('helmet')
-const rateLimit = require('express-rate-limit')
-
-const app = express()
-const PORT = process.env.PORT || 3001
+        return self._render('engineer/api_app', stream, description=description)
 
-// 安全中间件
-app.use(helmet())
-app.use(cors())
-
-// 限流
-const limiter = rateLimit({{
-  windowMs: 15 * 60 * 1000, // 15分钟
-  max: 100 // 限制每个IP 100次请求
-}})
-app.use(limiter)
-
-// 解析JSON
-app.use(express.json())
-
-// 健康检查
-app.get('/health', (req, res) => {{
-  res.json({{ status: 'healthy', timestamp: new Date().toISOString() }})
-}})
-
-// API文档
-app.get('/api/docs', (req, res) => {{
-  res.json({{
-    title: 'API文档',
-    description: '{description}',
-    version: '1.0.0',
-    endpoints: [
-      'GET /health - 健康检查',
-      'GET /api/docs - API文档'
-    ]
-  }})
-}})
-
-app.listen(PORT, () => {{
-  console.log(`API服务运行在端口 ${{PORT}}`)
-}})
-
-module.exports = app'''
-
-    def _generate_api_routes(self, description: str) -> str:
+    def _generate_api_routes(self, description: str, stream: bool = False) -> Union[str, Iterator[str]]:
         """生成API路由"""
-        return '''const express = require('express')
-const router = express.Router()
-
-// 用户路由
-router.get('/users', (req, res) => {
-  res.json({ message: '获取用户列表', users: [] })
-})
-
-router.post('/users', (req, res) => {
-  const { username, email } = req.body
-  res.json({ message: '用户创建成功', user: { username, email } })
-})
-
-router.get('/users/:id', (req, res) => {
-  const { id } = req.params
-  res.json({ message: '获取用户详情', userId: id })
-})
-
-module.exports = router'''
+        return self._render('engineer/api_routes', stream)
 
-    def _generate_python_script(self, description: str) -> str:
+    def _generate_python_script(self, description: str, stream: bool = False) -> Union[str, Iterator[str]]:
         """生成Python脚本"""
-        return f'''#!/usr/bin/env python3
-"""
-{description}
+        return self._render('engineer/python_script', stream, description=description)
 
-使用方法:
-    python main.py [参数]
-"""
-
-import argparse
-import logging
-from config import Config
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
-def main():
-    """主函数"""
-    parser = argparse.ArgumentParser(description='{description}')
-    parser.add_argument('--config', help='配置文件路径')
-    parser.add_argument('--verbose', action='store_true', help='详细输出')
-    
-    args = parser.parse_args()
-    
-    if args.verbose:
-        logger.setLevel(logging.DEBUG)
-    
-    logger.info('脚本开始执行...')
-    
-    # 加载配置
-    config = Config(args.config)
-    
-    # 主要逻辑
-    try:
-        process_data()
-        logger.info('脚本执行完成')
-    except Exception as e:
-        logger.error(f'执行失败: {{e}}')
-        return 1
-    
-    return 0
-
-def process_data():
-    """处理数据的主要逻辑"""
-    logger.info('开始处理数据...')
-    # 具体的处理逻辑
-    pass
-
-if __name__ == '__main__':
-    exit(main())'''
-
-    def _generate_config_file(self) -> str:
+    def _generate_config_file(self, stream: bool = False) -> Union[str, Iterator[str]]:
         """生成配置文件"""
-        return '''"""
-配置管理模块
-"""
-
-import os
-import json
-from typing import Dict, Any
+        return self._render('engineer/config_file', stream)
 
-class Config:
-    """配置类"""
-    
-    def __init__(self, config_path: str = None):
-        self.config_path = config_path or 'config.json'
-        self.config = self.load_config()
-    
-    def load_config(self) -> Dict[str, Any]:
-        """加载配置"""
-        default_config = {
-            'debug': False,
-            'log_level': 'INFO',
-            'timeout': 30,
-            'max_retries': 3
-        }
-        
-        if os.path.exists(self.config_path):
-            try:
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    return {**default_config, **json.load(f)}
-            except Exception as e:
-                print(f'加载配置文件失败: {e}')
-        
-        return default_config
-    
-    def get(self, key: str, default=None):
-        """获取配置值"""
-        return self.config.get(key, default)
-    
-    def set(self, key: str, value: Any):
-        """设置配置值"""
-        self.config[key] = value
-    
-    def save(self):
-        """保存配置到文件"""
-        try:
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f'保存配置文件失败: {e}')'''
+    def _render(self, template_id: str, stream: bool, **values: Any) -> Union[str, Iterator[str]]:
+        if stream:
+            return self.templates.render_stream(template_id, **values)
+        return self.templates.render(template_id, **values)
 
     async def send_status_update(self, message: str):
         """发送状态更新"""
@@ -453,7 +202,7 @@ class Config:
             'payload': {
                 'agent': self.role_name,
                 'message': message,
-                'timestamp': time.time()
+                'timestamp': self.pacer.now()
             }
         })
         self.logger.info(f"Engineer Status: {message}")
\ No newline at end of file
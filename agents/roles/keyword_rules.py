@@ -0,0 +1,53 @@
+# 产品经理和架构师共用的描述关键词规则。
+# 所有规则的关键词在导入时构建为同一个 KeywordIndex，项目描述只扫描一次，
+# 各角色从同一个命中集合中读取结果，新增规则不会增加扫描次数。
+
+from utils.keyword_index import KeywordIndex
+
+# 产品经理：功能需求
+FUNCTIONAL_REQUIREMENT_RULES = [
+    (("用户",), "用户管理系统"),
+    (("登录", "认证"), "用户认证功能"),
+    (("数据",), "数据管理功能"),
+    (("搜索",), "搜索功能"),
+]
+
+# 产品经理：用户故事
+USER_STORY_RULES = [
+    (("管理",), "作为管理员，我希望能够管理用户和权限"),
+    (("分析",), "作为用户，我希望能够查看数据分析报告"),
+    (("通知",), "作为用户，我希望能够接收重要通知"),
+]
+
+# 架构师：数据表
+DATABASE_TABLE_RULES = [
+    (("项目", "任务"), ['projects', 'tasks']),
+    (("文件",), ['files']),
+    (("日志", "记录"), ['logs']),
+    (("评论", "反馈"), ['comments']),
+]
+
+# 架构师：API接口
+API_ENDPOINT_RULES = [
+    (("项目",), [
+        'GET /api/projects',
+        'POST /api/projects',
+        'GET /api/projects/:id',
+        'PUT /api/projects/:id',
+        'DELETE /api/projects/:id'
+    ]),
+    (("文件",), [
+        'GET /api/files',
+        'POST /api/files/upload',
+        'GET /api/files/:id/download'
+    ]),
+]
+
+ALL_RULES = (
+    FUNCTIONAL_REQUIREMENT_RULES
+    + USER_STORY_RULES
+    + DATABASE_TABLE_RULES
+    + API_ENDPOINT_RULES
+)
+
+KEYWORD_INDEX = KeywordIndex(keyword for keywords, _ in ALL_RULES for keyword in keywords)
@@ -1,54 +1,54 @@
-import asyncio
-import time
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, FrozenSet
 from utils.message_sender import MessageSender
 from utils.logger import setup_logger
+from utils.pacing import Pacer, RealPacer
+from utils.tracing import NULL_TRACER, traced
+from utils.keyword_index import apply_rules
+from roles.keyword_rules import KEYWORD_INDEX, FUNCTIONAL_REQUIREMENT_RULES, USER_STORY_RULES
 
 class CustomProductManager:
     """自定义产品经理角色"""
     
-    def __init__(self, project_id: str, message_sender: MessageSender):
+    def __init__(self, project_id: str, message_sender: MessageSender, pacer: Optional[Pacer] = None,
+                 tracer: Any = NULL_TRACER):
         self.project_id = project_id
         self.message_sender = message_sender
-        self.logger = setup_logger(f"{project_id}_pm")
+        self.pacer = pacer or RealPacer()
+        self.tracer = tracer
+        self.logger = setup_logger(f"{project_id}_pm", project_id=project_id)
         self.role_name = "ProductManager"
 
-    async def analyze_requirements(self, description: str, requirements: List[str]) -> Dict[str, Any]:
-        """分析项目需求"""
+    @traced('pm.analyze_requirements')
+    async def analyze_requirements(self, description: str, requirements: List[str],
+                                   matches: Optional[FrozenSet[str]] = None) -> Dict[str, Any]:
+        """分析项目需求，matches 为描述的关键词命中集合（未提供时扫描一次描述）"""
         await self.send_status_update("开始分析项目需求...")
         
         # 模拟需求分析过程
-        await asyncio.sleep(1)
+        await self.pacer.pause(1, 'pm.analyze')
         
         await self.send_status_update("解析功能需求...")
         
         # 基于描述和需求生成分析结果
+        if matches is None:
+            matches = KEYWORD_INDEX.scan(description)
         analysis = {
-            'functional_requirements': self._extract_functional_requirements(description, requirements),
+            'functional_requirements': self._extract_functional_requirements(matches, requirements),
             'non_functional_requirements': self._extract_non_functional_requirements(),
-            'user_stories': self._generate_user_stories(description),
+            'user_stories': self._generate_user_stories(matches),
             'acceptance_criteria': self._generate_acceptance_criteria()
         }
         
-        await asyncio.sleep(1)
+        await self.pacer.pause(1, 'pm.parse')
         await self.send_status_update("需求分析完成，生成PRD文档")
         
         self.logger.info(f"Requirements analysis completed for project {self.project_id}")
         return analysis
 
-    def _extract_functional_requirements(self, description: str, requirements: List[str]) -> List[str]:
+    def _extract_functional_requirements(self, matches: FrozenSet[str], requirements: List[str]) -> List[str]:
         """提取功能需求"""
-        functional_reqs = []
-        
         # 基于项目描述提取需求
-        if "用户" in description:
-            functional_reqs.append("用户管理系统")
-        if "登录" in description or "认证" in description:
-            functional_reqs.append("用户认证功能")
-        if "数据" in description:
-            functional_reqs.append("数据管理功能")
-        if "搜索" in description:
-            functional_reqs.append("搜索功能")
+        functional_reqs = apply_rules(FUNCTIONAL_REQUIREMENT_RULES, matches)
         
         # 添加用户提供的需求
         functional_reqs.extend(requirements)
@@ -65,7 +65,7 @@ class CustomProductManager:
             "界面友好易用"
         ]
 
-    def _generate_user_stories(self, description: str) -> List[str]:
+    def _generate_user_stories(self, matches: FrozenSet[str]) -> List[str]:
         """生成用户故事"""
         stories = [
             "作为用户，我希望能够快速注册和登录系统",
@@ -74,12 +74,7 @@ class CustomProductManager:
         ]
         
         # 根据项目描述添加特定用户故事
-        if "管理" in description:
-            stories.append("作为管理员，我希望能够管理用户和权限")
-        if "分析" in description:
-            stories.append("作为用户，我希望能够查看数据分析报告")
-        if "通知" in description:
-            stories.append("作为用户，我希望能够接收重要通知")
+        stories.extend(apply_rules(USER_STORY_RULES, matches))
             
         return stories
 
@@ -100,7 +95,7 @@ class CustomProductManager:
             'payload': {
                 'agent': self.role_name,
                 'message': message,
-                'timestamp': time.time()
+                'timestamp': self.pacer.now()
             }
         })
         self.logger.info(f"PM Status: {message}")
\ No newline at end of file
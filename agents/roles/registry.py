@@ -0,0 +1,25 @@
+import importlib
+from functools import lru_cache
+from typing import Dict, Any
+
+# 角色名 -> "模块:类名"。角色模块在第一次使用时才导入；
+# 角色依赖的重量级后端（LLM 客户端等）也应在角色内部按需导入，而不是在模块顶层。
+ROLE_CLASSES: Dict[str, str] = {
+    'product_manager': 'roles.product_manager:CustomProductManager',
+    'architect': 'roles.architect:CustomArchitect',
+    'engineer': 'roles.engineer:CustomEngineer',
+}
+
+@lru_cache(maxsize=None)
+def load_object(path: str) -> Any:
+    """按 "模块:属性" 导入对象"""
+    module_name, _, attribute = path.partition(':')
+    return getattr(importlib.import_module(module_name), attribute)
+
+def load_role(name: str) -> type:
+    """导入并返回角色类"""
+    try:
+        path = ROLE_CLASSES[name]
+    except KeyError:
+        raise KeyError(f'Unknown role: {name}') from None
+    return load_object(path)
@@ -0,0 +1,45 @@
+import threading
+import time
+from typing import Optional, Tuple
+
+from utils.artifact_store import ArtifactStore
+from utils.checkpoint_store import CheckpointStore
+from utils.logger import setup_logger
+from utils.metrics import REGISTRY
+from utils.result_cache import ResultCache
+
+ARTIFACT_GC_BYTES = REGISTRY.counter('agent_artifact_gc_bytes_total',
+                                     'Bytes of unreferenced artifacts removed from the content store')
+
+# 同一进程内两次回收的最小间隔（秒），以及未被引用的内容至少保留的时间
+GC_INTERVAL = 3600
+GC_MIN_AGE = 24 * 3600
+
+_lock = threading.Lock()
+_last_run = 0.0
+
+def collect_garbage(store: ArtifactStore, cache: Optional[ResultCache], checkpoints: CheckpointStore,
+                    min_age: float = GC_MIN_AGE) -> Tuple[int, int]:
+    """删除结果缓存清单和检查点都不再引用的内容，返回 (删除的数量, 释放的字节数)
+
+    结果缓存淘汰条目后，只有它们引用的内容会在 min_age 之后被回收；工作区中的文件是独立的副本，不受影响。
+    cache 为 None（未启用结果缓存）时只以检查点为根，之后缓存命中时内容已被回收的条目按未命中处理。
+    """
+    live = checkpoints.referenced_hashes()
+    if cache is not None:
+        live |= cache.referenced_hashes()
+    removed, freed = store.sweep(live, min_age)
+    ARTIFACT_GC_BYTES.inc(freed)
+    if removed:
+        setup_logger('artifact_gc').info(f"Removed {removed} unreferenced artifacts ({freed} bytes)")
+    return removed, freed
+
+def gc_due() -> bool:
+    """距离本进程上一次回收超过 GC_INTERVAL 时返回 True，并把本次记为已开始"""
+    global _last_run
+    with _lock:
+        now = time.time()
+        if now - _last_run < GC_INTERVAL:
+            return False
+        _last_run = now
+        return True
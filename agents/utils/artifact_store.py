@@ -0,0 +1,148 @@
+import hashlib
+import os
+import tempfile
+import time
+from typing import Iterator, Optional, Set, Tuple
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(__file__), '..', '.artifacts')
+
+def content_hash(content: str) -> str:
+    """文件内容的 sha256 摘要（UTF-8 编码）"""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+class ArtifactStore:
+    """内容寻址的本地文件存储，同一台机器上的所有运行共享
+
+    内容按 sha256 存放在 <root>/<前两位>/<完整摘要>，写入使用临时文件加原子重命名，
+    多个进程同时写同一内容也是安全的。再次写入已有内容时刷新其修改时间，sweep 据此保留最近用到的内容。
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = os.path.abspath(root or DEFAULT_STORE_DIR)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def has(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+
+    def put(self, content: str) -> str:
+        """保存内容并返回摘要，已存在时不重复写入"""
+        digest = content_hash(content)
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            _touch(path)
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content.encode('utf-8'))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest
+
+    def open_writer(self) -> 'ArtifactWriter':
+        """逐段写入内容，提交时才知道摘要"""
+        return ArtifactWriter(self)
+
+    def get(self, digest: str) -> Optional[str]:
+        """按摘要读取内容，不存在时返回 None"""
+        if len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest):
+            return None
+        try:
+            with open(self.path_for(digest), 'rb') as f:
+                return f.read().decode('utf-8')
+        except FileNotFoundError:
+            return None
+
+    def iter_blobs(self) -> Iterator[Tuple[str, str]]:
+        """遍历存储中的 (摘要, 路径)，包括未提交的临时文件（摘要为文件名）"""
+        try:
+            prefixes = os.listdir(self.root)
+        except FileNotFoundError:
+            return
+        for prefix in prefixes:
+            directory = os.path.join(self.root, prefix)
+            if prefix.startswith('.tmp-'):
+                yield prefix, directory
+            elif os.path.isdir(directory):
+                for name in os.listdir(directory):
+                    yield name, os.path.join(directory, name)
+
+    def sweep(self, live: Set[str], min_age: float) -> Tuple[int, int]:
+        """删除不在 live 中、且超过 min_age 秒未写入的内容，返回 (删除的数量, 释放的字节数)
+
+        min_age 为正在运行、还没有写入任何清单的工作流留出时间。
+        """
+        cutoff = time.time() - min_age
+        removed = freed = 0
+        for digest, path in self.iter_blobs():
+            if digest in live:
+                continue
+            try:
+                info = os.stat(path)
+                if info.st_mtime >= cutoff:
+                    continue
+                os.unlink(path)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            freed += info.st_size
+        return removed, freed
+
+def _touch(path: str) -> None:
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+class ArtifactWriter:
+    """流式写入存储：内容写到临时文件并同时计算摘要，commit 时重命名到摘要路径"""
+
+    def __init__(self, store: ArtifactStore):
+        self.store = store
+        self.size = 0
+        self._digest = hashlib.sha256()
+        os.makedirs(store.root, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=store.root, prefix='.tmp-')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, text: str) -> int:
+        """写入一段文本，返回其 UTF-8 字节数"""
+        encoded = text.encode('utf-8')
+        self._file.write(encoded)
+        self._digest.update(encoded)
+        self.size += len(encoded)
+        return len(encoded)
+
+    def commit(self) -> str:
+        """完成写入并返回摘要，内容已存在时丢弃临时文件"""
+        self._file.close()
+        digest = self._digest.hexdigest()
+        path = self.store.path_for(digest)
+        if os.path.exists(path):
+            os.unlink(self._tmp_path)
+            _touch(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self._tmp_path, path)
+        return digest
+
+    def abort(self) -> None:
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.unlink(self._tmp_path)
+
+_default_store: Optional[ArtifactStore] = None
+
+def get_artifact_store() -> ArtifactStore:
+    """进程内共享的默认存储"""
+    global _default_store
+    if _default_store is None:
+        _default_store = ArtifactStore()
+    return _default_store
@@ -0,0 +1,99 @@
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Dict, Any, Optional, Set
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), '..', 'checkpoints')
+
+class CheckpointStore:
+    """每个项目一个 JSON 检查点文件：<root>/<project_id>.json
+
+    写入使用临时文件、fsync 加原子重命名，进程在任意时刻被杀死后读到的都是完整的上一个检查点。
+    失败或取消的项目留下的检查点超过 max_age 秒未更新后删除（保存时最多每 evict_interval 秒检查一次）。
+    """
+
+    def __init__(self, root: Optional[str] = None, max_age: float = 7 * 24 * 3600,
+                 evict_interval: float = 3600):
+        self.root = os.path.abspath(root or DEFAULT_CHECKPOINT_DIR)
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self._last_evict = 0.0
+
+    def path_for(self, project_id: str) -> str:
+        return os.path.join(self.root, re.sub(r'[^\w.-]', '_', project_id) + '.json')
+
+    def save(self, project_id: str, checkpoint: Dict[str, Any]) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path_for(project_id))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        if time.time() - self._last_evict >= self.evict_interval:
+            self.evict()
+
+    def load(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """读取检查点，不存在或已损坏时返回 None"""
+        try:
+            with open(self.path_for(project_id), 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return checkpoint if isinstance(checkpoint, dict) else None
+
+    def referenced_hashes(self) -> Set[str]:
+        """所有检查点引用的内容摘要"""
+        hashes: Set[str] = set()
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return hashes
+        for name in names:
+            if name.endswith('.json'):
+                checkpoint = self.load(name[:-len('.json')])
+                hashes.update(record['contentHash'] for record in (checkpoint or {}).get('files', []))
+        return hashes
+
+    def clear(self, project_id: str) -> None:
+        try:
+            os.unlink(self.path_for(project_id))
+        except FileNotFoundError:
+            pass
+
+    def evict(self) -> int:
+        """删除超过 max_age 秒未更新的检查点（以及中断写入留下的临时文件），返回删除的数量"""
+        self._last_evict = time.time()
+        cutoff = self._last_evict - self.max_age
+        removed = 0
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            if not (name.endswith('.json') or name.startswith('.tmp-')):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+_default_store: Optional[CheckpointStore] = None
+
+def get_checkpoint_store() -> CheckpointStore:
+    """进程内共享的默认检查点存储"""
+    global _default_store
+    if _default_store is None:
+        _default_store = CheckpointStore()
+    return _default_store
@@ -0,0 +1,92 @@
+import base64
+import zlib
+from typing import Dict, Any, List, Optional, Callable
+
+from utils.metrics import REGISTRY
+
+COMPRESSION_BYTES = REGISTRY.counter('agent_payload_compression_bytes_total',
+                                     'Bytes of compressed payload fields before and after encoding', ('stage',))
+
+# 可压缩的消息字段：消息类型 -> 字段名。压缩后字段值为 base64 文本，并增加 <字段名>Encoding 标明编码
+COMPRESSIBLE_FIELDS = {
+    'file_generated': 'content',
+    'file_chunk': 'data',
+    'file_partial': 'data',
+    'blob': 'content',
+}
+
+# 优先级从高到低
+ENCODINGS = ('zstd', 'zlib')
+
+def _zstd_compress() -> Optional[Callable[[bytes], bytes]]:
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdCompressor(level=3).compress
+
+def available_encodings() -> List[str]:
+    """本机支持的编码（zstd 需要安装 zstandard）"""
+    return [encoding for encoding in ENCODINGS if encoding == 'zlib' or _zstd_compress() is not None]
+
+def negotiate(accepted: List[str]) -> Optional[str]:
+    """按消费端给出的顺序选择第一个本机支持的编码，没有时返回 None（不压缩）"""
+    available = available_encodings()
+    for encoding in accepted:
+        if encoding in available:
+            return encoding
+    return None
+
+class PayloadCompressor:
+    """压缩消息中的大文本字段
+
+    只处理 COMPRESSIBLE_FIELDS 中列出的字段，UTF-8 长度不足 threshold 字节，
+    或压缩加 base64 后没有变小时保持原样，因此未协商压缩的旧消费端不受影响。
+    """
+
+    def __init__(self, encoding: str = 'zlib', threshold: int = 4096):
+        if encoding == 'zstd':
+            compress = _zstd_compress()
+            if compress is None:
+                raise ValueError('zstd compression requires the zstandard package')
+            self._compress = compress
+        elif encoding == 'zlib':
+            self._compress = zlib.compress
+        else:
+            raise ValueError(f'Unknown compression encoding: {encoding}')
+        self.encoding = encoding
+        self.threshold = threshold
+
+    def compress(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        field = COMPRESSIBLE_FIELDS.get(data.get('type'))
+        payload = data.get('payload')
+        if field is None or not isinstance(payload, dict) or not isinstance(payload.get(field), str):
+            return data
+
+        raw = payload[field].encode('utf-8')
+        if len(raw) < self.threshold:
+            return data
+        encoded = base64.b64encode(self._compress(raw)).decode('ascii')
+        if len(encoded) >= len(raw):
+            return data
+
+        COMPRESSION_BYTES.inc(len(raw), stage='raw')
+        COMPRESSION_BYTES.inc(len(encoded), stage='encoded')
+        return {**data, 'payload': {**payload, field: encoded, f'{field}Encoding': self.encoding}}
+
+def create_compressor(accept: Optional[str], threshold: int = 4096) -> Optional[PayloadCompressor]:
+    """accept 为逗号分隔的可接受编码（如 "zstd,zlib"），协商不出编码时返回 None"""
+    if not accept:
+        return None
+    encoding = negotiate([item.strip() for item in accept.split(',') if item.strip()])
+    return PayloadCompressor(encoding, threshold) if encoding else None
+
+def decompress_field(value: str, encoding: str) -> str:
+    """解码压缩过的字段（供测试和 Python 消费端使用）"""
+    raw = base64.b64decode(value)
+    if encoding == 'zlib':
+        return zlib.decompress(raw).decode('utf-8')
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(raw).decode('utf-8')
+    raise ValueError(f'Unknown compression encoding: {encoding}')
@@ -0,0 +1,95 @@
+import re
+from collections import deque
+from typing import Dict, List, Iterable, FrozenSet, Sequence, Tuple, Any
+
+class KeywordIndex:
+    """Aho-Corasick 多模式匹配：一次扫描文本得到其中出现的全部关键词
+
+    构建一次后可以反复使用；扫描耗时与文本长度成线性关系，与关键词数量无关。
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: FrozenSet[str] = frozenset(keyword for keyword in keywords if keyword)
+        # 状态 0 为根节点
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[FrozenSet[str]] = [frozenset()]
+
+        outputs: List[set] = [set()]
+        for keyword in sorted(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append(set())
+                state = next_state
+            outputs[state].add(keyword)
+
+        # 按广度优先计算失败指针，并合并后缀状态的输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                outputs[next_state] |= outputs[self._fail[next_state]]
+
+        self._output = [frozenset(found) for found in outputs]
+        # 关键词首字符的字符类：在根状态时用正则（C 实现）直接跳到下一个可能的匹配起点
+        first_chars = sorted({keyword[0] for keyword in self.keywords})
+        self._starts = re.compile('[' + ''.join(re.escape(char) for char in first_chars) + ']') if first_chars else None
+
+    def scan(self, text: str) -> FrozenSet[str]:
+        """返回文本中出现的关键词集合"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found = set()
+        remaining = len(self.keywords)
+        if self._starts is None:
+            return frozenset()
+        search = self._starts.search
+        state = 0
+        position = 0
+        length = len(text)
+
+        while position < length:
+            if not state:
+                # 根状态下跳过不可能开始匹配的字符
+                match = search(text, position)
+                if match is None:
+                    break
+                position = match.start()
+            char = text[position]
+            position += 1
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+                # 所有关键词都已出现时提前结束
+                if len(found) == remaining:
+                    break
+
+        return frozenset(found)
+
+Rule = Tuple[Sequence[str], Any]
+
+def apply_rules(rules: Sequence[Rule], matches: FrozenSet[str]) -> List[Any]:
+    """按规则顺序收集命中规则的结果；规则的任一关键词出现即命中"""
+    results: List[Any] = []
+    for keywords, result in rules:
+        if any(keyword in matches for keyword in keywords):
+            if isinstance(result, list):
+                results.extend(result)
+            else:
+                results.append(result)
+    return results
@@ -1,41 +1,275 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
-from typing import Optional
-
-def setup_logger(name: str, log_level: str = "INFO") -> logging.Logger:
-    """设置日志记录器"""
-    
-    # 创建日志目录
-    log_dir = os.path.join(os.path.dirname(__file__), '..', 'logs')
-    os.makedirs(log_dir, exist_ok=True)
-    
+import queue
+import threading
+from collections import OrderedDict
+import time
+from typing import Dict, Optional, Set
+
+from utils.metrics import REGISTRY
+
+LOG_WRITE_SECONDS = REGISTRY.histogram('agent_log_write_seconds', 'Time spent formatting and writing one log record')
+LOG_QUEUE_DEPTH = REGISTRY.gauge('agent_log_queue_records', 'Log records waiting for the listener thread')
+
+LOG_DIR = os.path.join(os.path.dirname(__file__), '..', 'logs')
+
+FORMATTER = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+class PooledFileHandler(logging.Handler):
+    """按 logger 名称写入各自的日志文件，最多同时打开 max_open 个文件，超出时关闭最久未用的文件
+
+    每个文件超过 max_bytes 时轮转，保留 backup_count 个旧文件。
+    """
+
+    def __init__(self, log_dir: str, max_open: int = 32, max_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 3):
+        super().__init__(logging.DEBUG)
+        self.log_dir = log_dir
+        self.max_open = max(1, max_open)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._files: 'OrderedDict[str, logging.Handler]' = OrderedDict()
+
+    def _handler_for(self, name: str) -> logging.Handler:
+        handler = self._files.get(name)
+        if handler is not None:
+            self._files.move_to_end(name)
+            return handler
+
+        handler = logging.handlers.RotatingFileHandler(
+            os.path.join(self.log_dir, f'{name}.log'),
+            maxBytes=self.max_bytes,
+            backupCount=self.backup_count,
+            encoding='utf-8',
+            delay=True
+        )
+        handler.setFormatter(self.formatter)
+        self._files[name] = handler
+        while len(self._files) > self.max_open:
+            _, oldest = self._files.popitem(last=False)
+            oldest.close()
+        return handler
+
+    @property
+    def open_files(self) -> int:
+        return len(self._files)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self._handler_for(record.name).handle(record)
+        except Exception:
+            self.handleError(record)
+
+    def close_file(self, name: str) -> None:
+        """关闭指定 logger 的日志文件"""
+        handler = self._files.pop(name, None)
+        if handler is not None:
+            handler.close()
+
+    def close(self) -> None:
+        for handler in self._files.values():
+            handler.close()
+        self._files.clear()
+        super().close()
+
+class JsonLinesFormatter(logging.Formatter):
+    """多路复用日志的格式：每行一个 JSON 对象，带 projectId"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%d %H:%M:%S'),
+            'projectId': getattr(record, 'project_id', None),
+            'logger': record.name,
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+class ProjectFilter(logging.Filter):
+    """给日志记录附上所属的项目ID"""
+
+    def __init__(self, project_id: str):
+        super().__init__()
+        self.project_id = project_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.project_id = self.project_id
+        return True
+
+class LoggingPipeline:
+    """异步日志管道：logger 只把记录放进队列，格式化和磁盘 I/O 在 QueueListener 线程中完成
+
+    log_format 为 text 时每个 logger 写入各自的文件（文件句柄池化），
+    为 json 时所有 logger 写入同一个按 projectId 区分的 JSON-lines 文件；
+    fork 出的子进程（如 --batch 的 worker）改写 agents-<pid>.jsonl，避免多个进程轮转同一个文件。
+    """
+
+    def __init__(self, log_dir: Optional[str] = None, log_format: str = 'text', max_open: int = 32,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3, console: bool = True):
+        self.log_dir = log_dir or LOG_DIR
+        self.log_format = log_format
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue: 'queue.SimpleQueue[logging.LogRecord]' = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._pid = 0
+        self._projects: Dict[str, Set[str]] = {}
+
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(FORMATTER)
+
+        if log_format == 'json':
+            self.file_handler: logging.Handler = self._json_handler('agents.jsonl')
+        else:
+            self.file_handler = PooledFileHandler(self.log_dir, max_open, max_bytes, backup_count)
+            self.file_handler.setFormatter(FORMATTER)
+        self.handlers = (console_handler, self.file_handler) if console else (self.file_handler,)
+
+    def _json_handler(self, filename: str) -> logging.Handler:
+        handler = logging.handlers.RotatingFileHandler(
+            os.path.join(self.log_dir, filename),
+            maxBytes=self.max_bytes,
+            backupCount=self.backup_count,
+            encoding='utf-8',
+            delay=True
+        )
+        handler.setFormatter(JsonLinesFormatter())
+        return handler
+
+    def ensure_started(self) -> None:
+        """启动监听线程；fork 出的子进程中重新启动"""
+        if self._listener is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                return
+            if self._pid:
+                # fork 出的子进程：丢弃从父进程复制来的、父进程自己会写出的记录
+                while not self.queue.empty():
+                    self.queue.get_nowait()
+                if self.log_format == 'json':
+                    # 不与父进程和其他 worker 共用同一个轮转文件
+                    inherited = self.file_handler
+                    self.file_handler = self._json_handler(f'agents-{os.getpid()}.jsonl')
+                    self.handlers = tuple(self.file_handler if handler is inherited else handler
+                                          for handler in self.handlers)
+                    inherited.close()
+            os.makedirs(self.log_dir, exist_ok=True)
+            self._listener = _PipelineListener(self, self.queue, *self.handlers,
+                                               respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def register(self, logger: logging.Logger, project_id: Optional[str]) -> None:
+        self._projects.setdefault(project_id or logger.name, set()).add(logger.name)
+
+    def close_project(self, project_id: str) -> None:
+        """释放项目相关的所有 logger 和日志文件，供常驻进程在任务结束后调用"""
+        for name in self._projects.pop(project_id, ()):
+            logger = logging.getLogger(name)
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+            for log_filter in list(logger.filters):
+                logger.removeFilter(log_filter)
+            logging.Logger.manager.loggerDict.pop(name, None)
+            if isinstance(self.file_handler, PooledFileHandler):
+                # 在监听线程中关闭文件，避免与正在写入的记录竞争
+                self.queue.put(_ReleaseRecord(name))
+
+    def stop(self) -> None:
+        """写出队列中剩余的日志并关闭所有文件"""
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+        for handler in self.handlers:
+            handler.close()
+
+class _ReleaseRecord(logging.LogRecord):
+    """队列中的控制记录：通知文件池关闭某个 logger 的文件"""
+
+    def __init__(self, name: str):
+        super().__init__(name, logging.CRITICAL, '', 0, '', None, None)
+
+class _PipelineListener(logging.handlers.QueueListener):
+    def __init__(self, pipeline: LoggingPipeline, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pipeline = pipeline
+
+    def handle(self, record: logging.LogRecord) -> None:
+        if isinstance(record, _ReleaseRecord):
+            self.pipeline.file_handler.close_file(record.name)
+            return
+        started = time.perf_counter()
+        super().handle(record)
+        LOG_WRITE_SECONDS.observe(time.perf_counter() - started)
+
+class _PipelineQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, pipeline: LoggingPipeline):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self.pipeline.ensure_started()
+        super().enqueue(record)
+
+_pipeline: Optional[LoggingPipeline] = None
+
+def configure_logging(log_format: str = 'text', max_open: int = 32,
+                      max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3,
+                      log_dir: Optional[str] = None, console: bool = True) -> LoggingPipeline:
+    """配置日志管道，需在创建 logger 之前调用"""
+    global _pipeline
+    if _pipeline is not None:
+        _pipeline.stop()
+    _pipeline = LoggingPipeline(log_dir, log_format, max_open, max_bytes, backup_count, console)
+    return _pipeline
+
+def get_logging_pipeline() -> LoggingPipeline:
+    """进程内共享的日志管道"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LoggingPipeline()
+    return _pipeline
+
+def setup_logger(name: str, log_level: str = "INFO", project_id: Optional[str] = None) -> logging.Logger:
+    """设置日志记录器，project_id 用于多路复用日志和释放项目的 logger"""
+
     # 创建logger
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, log_level.upper()))
-    
+
     # 避免重复添加handler
     if logger.handlers:
         return logger
-    
-    # 创建formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
-    # 控制台handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-    
-    # 文件handler
-    file_handler = logging.FileHandler(
-        os.path.join(log_dir, f'{name}.log'),
-        encoding='utf-8'
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    
-    return logger
\ No newline at end of file
+
+    pipeline = get_logging_pipeline()
+    pipeline.ensure_started()
+    if project_id is not None:
+        logger.addFilter(ProjectFilter(project_id))
+    logger.addHandler(_PipelineQueueHandler(pipeline))
+    # 只经由队列输出，不再传递给根 logger
+    logger.propagate = False
+    pipeline.register(logger, project_id)
+
+    return logger
+
+def close_project_loggers(project_id: str) -> None:
+    """释放项目的 logger 和日志文件"""
+    if _pipeline is not None:
+        _pipeline.close_project(project_id)
+
+def shutdown_logging() -> None:
+    if _pipeline is not None:
+        _pipeline.stop()
+
+LOG_QUEUE_DEPTH.set_function(lambda: _pipeline.queue.qsize() if _pipeline is not None else 0)
+
+atexit.register(shutdown_logging)
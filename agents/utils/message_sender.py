@@ -1,21 +1,211 @@
+import asyncio
+import hashlib
 import json
+import os
+import stat
 import sys
-from typing import Dict, Any
+import uuid
+from typing import Dict, Any, List, Optional, Callable, Set
+
+from utils.compression import PayloadCompressor
+from utils.tracing import current_span
+from utils.metrics import REGISTRY
+
+MESSAGES_SENT = REGISTRY.counter('agent_messages_sent_total', 'Messages sent to the backend', ('type',))
+OUTPUT_QUEUE_DEPTH = REGISTRY.gauge('agent_output_queue_messages', 'Messages waiting to be written to the output pipe')
+PIPE_WRITE_BYTES = REGISTRY.counter('agent_pipe_write_bytes_total', 'Bytes written to the output pipe')
+PIPE_WRITE_SECONDS = REGISTRY.histogram('agent_pipe_write_seconds', 'Time spent writing to the output pipe')
+PIPE_DRAIN_SECONDS = REGISTRY.histogram('agent_pipe_drain_seconds', 'Time spent waiting for the output pipe to drain')
+
+def encode_message(data: Dict[str, Any]) -> str:
+    """序列化一条消息，失败时返回错误消息"""
+    try:
+        return json.dumps(data, ensure_ascii=False)
+    except Exception as e:
+        # 发生错误时，发送错误消息
+        error_message = {
+            'type': 'error',
+            'payload': {
+                'message': f'消息发送失败: {str(e)}'
+            }
+        }
+        if 'projectId' in data:
+            error_message['projectId'] = data['projectId']
+        return json.dumps(error_message)
+
+class OutputChannel:
+    """逐条同步输出的消息通道（默认行为）"""
+
+    def __init__(self, write: Optional[Callable[[str], None]] = None):
+        self._write = write or self._write_stdout
+        # 消费端已经持有的内容摘要，用于去重时只发送引用
+        self.known_hashes: Set[str] = set()
+        # 与消费端协商的负载压缩（命令行 --compress 或常驻模式的 hello 握手），None 表示不压缩
+        self.compressor: Optional[PayloadCompressor] = None
+
+    @staticmethod
+    def _write_stdout(line: str) -> None:
+        print(line, flush=True)
+
+    def put(self, data: Dict[str, Any]) -> None:
+        line = encode_message(data)
+        with PIPE_WRITE_SECONDS.time():
+            self._write(line)
+        PIPE_WRITE_BYTES.inc(len(line.encode('utf-8')) + 1)
+
+    async def drain(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+class BatchedOutputChannel(OutputChannel):
+    """通过事件循环传输层异步输出的消息通道
+
+    同一轮事件循环内的消息合并为一次写入；drain() 在传输层缓冲超过高水位时等待，
+    形成背压。coalesce_progress 为 True 时，连续的同阶段 progress 消息只保留最新一条，
+    file_generated 和 error 等其它消息从不丢弃。
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, coalesce_progress: bool = False):
+        super().__init__()
+        self._writer = writer
+        self.coalesce_progress = coalesce_progress
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+
+    def put(self, data: Dict[str, Any]) -> None:
+        if self.coalesce_progress and self._pending and self._supersedes(self._pending[-1], data):
+            self._pending[-1] = data
+        else:
+            self._pending.append(data)
+            OUTPUT_QUEUE_DEPTH.inc()
+
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_soon(self._flush)
+
+    @staticmethod
+    def _supersedes(previous: Dict[str, Any], data: Dict[str, Any]) -> bool:
+        return (
+            previous.get('type') == 'progress' and data.get('type') == 'progress'
+            and previous.get('projectId') == data.get('projectId')
+            and previous.get('payload', {}).get('stage') == data.get('payload', {}).get('stage')
+        )
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        OUTPUT_QUEUE_DEPTH.dec(len(pending))
+        lines = [encode_message(data) for data in pending]
+        encoded = ('\n'.join(lines) + '\n').encode('utf-8')
+        with PIPE_WRITE_SECONDS.time():
+            self._writer.write(encoded)
+        PIPE_WRITE_BYTES.inc(len(encoded))
+
+    async def drain(self) -> None:
+        with PIPE_DRAIN_SECONDS.time():
+            await self._writer.drain()
+
+    async def aclose(self) -> None:
+        """写出所有待发送消息，并等待传输层缓冲清空"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush()
+        transport = self._writer.transport
+        if not transport.is_closing():
+            transport.set_write_buffer_limits(high=0)
+            await self._writer.drain()
+
+async def open_stdout_channel(coalesce_progress: bool = False) -> OutputChannel:
+    """stdout 为管道或 socket 时使用异步批量通道，否则退回逐条同步输出"""
+    try:
+        mode = os.fstat(sys.stdout.fileno()).st_mode
+    except (AttributeError, OSError, ValueError):
+        return OutputChannel()
+    if not (stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode)):
+        return OutputChannel()
+
+    sys.stdout.flush()
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+    writer = asyncio.StreamWriter(transport, protocol, None, loop)
+    return BatchedOutputChannel(writer, coalesce_progress)
 
 class MessageSender:
     """消息发送器，用于向Node.js后端发送消息"""
-    
+
+    def __init__(self, project_id: Optional[str] = None,
+                 channel: Optional[OutputChannel] = None):
+        # project_id 不为空时，每条消息都会带上 projectId 字段（常驻模式下用于区分项目）
+        self.project_id = project_id
+        self.channel = channel or OutputChannel()
+
+    def bind(self, project_id: str) -> 'MessageSender':
+        """返回共享同一输出通道、但带有指定项目ID的发送器"""
+        return MessageSender(project_id, self.channel)
+
     async def send_message(self, data: Dict[str, Any]) -> None:
         """发送消息到Node.js后端"""
-        try:
-            message = json.dumps(data, ensure_ascii=False)
-            print(message, flush=True)
-        except Exception as e:
-            # 发生错误时，发送错误消息
-            error_message = {
-                'type': 'error',
+        if self.project_id is not None:
+            data = {**data, 'projectId': self.project_id}
+        if self.channel.compressor is not None:
+            data = self.channel.compressor.compress(data)
+        span = current_span()
+        if span is not None:
+            # 只在开启追踪时才额外序列化一次以统计字节数
+            span.add_message(len(encode_message(data).encode('utf-8')))
+        MESSAGES_SENT.inc(type=data.get('type', 'unknown'))
+        self.channel.put(data)
+        await self.channel.drain()
+
+    async def send_file(self, file: Dict[str, Any], chunk_size: int = 64 * 1024) -> None:
+        """分块发送大文件：file_begin、按序号的 file_chunk，最后 file_end 带长度和校验和
+
+        chunk_size 按字符计，length 为 UTF-8 字节数，sha256 为 UTF-8 内容的摘要。
+        """
+        content = file['content']
+        transfer_id = uuid.uuid4().hex
+        digest = hashlib.sha256()
+        length = 0
+
+        await self.send_message({
+            'type': 'file_begin',
+            'payload': {
+                **{key: value for key, value in file.items() if key != 'content'},
+                'transferId': transfer_id,
+                'chunkSize': chunk_size
+            }
+        })
+
+        index = 0
+        for start in range(0, len(content), chunk_size):
+            chunk = content[start:start + chunk_size]
+            encoded = chunk.encode('utf-8')
+            digest.update(encoded)
+            length += len(encoded)
+            await self.send_message({
+                'type': 'file_chunk',
                 'payload': {
-                    'message': f'消息发送失败: {str(e)}'
+                    'transferId': transfer_id,
+                    'index': index,
+                    'data': chunk
                 }
+            })
+            index += 1
+
+        await self.send_message({
+            'type': 'file_end',
+            'payload': {
+                'transferId': transfer_id,
+                'fileName': file.get('fileName'),
+                'chunks': index,
+                'length': length,
+                'sha256': digest.hexdigest()
             }
-            print(json.dumps(error_message), flush=True)
\ No newline at end of file
+        })
+
+    async def aclose(self) -> None:
+        """发送所有缓冲中的消息"""
+        await self.channel.aclose()
@@ -0,0 +1,342 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
+
+# 默认的耗时分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Metric:
+    """指标基类：按标签值分别计数，标签以关键字参数传入"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f'{self.name} expects labels {self.label_names}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, Any]:
+        """可 pickle 的当前取值（工作进程发给主进程合并）"""
+        with self._lock:
+            values = {key: (list(value) if isinstance(value, list) else value)
+                      for key, value in self._values.items()}
+        return {'kind': self.kind, 'help': self.help_text, 'labels': self.label_names, 'values': values}
+
+    def merge(self, values: Dict[LabelValues, Any]) -> None:
+        """把另一个进程的取值累加进来"""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def expose(self) -> str:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+                for key, value in items]
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """采集时调用 function 取值（仅用于无标签的指标）"""
+        self._function = function
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        if self._function is not None:
+            data['values'] = {(): self._function()}
+        return data
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f'{self.name} {_format_value(self._function())}']
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}'
+                for key, value in items]
+
+class Histogram(Metric):
+    """固定分桶的直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 每组标签: [各桶计数..., 总和, 总数]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            counts[-2] += value
+            counts[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels: Any) -> int:
+        counts = self._values.get(self._key(labels))
+        return int(counts[-1]) if counts else 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**super().snapshot(), 'buckets': self.buckets[:-1]}
+
+    def merge(self, values: Dict[LabelValues, Any]) -> None:
+        with self._lock:
+            for key, counts in values.items():
+                current = self._values.get(key)
+                if current is None:
+                    self._values[key] = list(counts)
+                else:
+                    self._values[key] = [a + b for a, b in zip(current, counts)]
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(counts)) for key, counts in self._values.items())
+        lines = []
+        for key, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {_format_value(cumulative)}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(counts[-2])}')
+            lines.append(f'{self.name}_count{labels} {_format_value(counts[-1])}')
+        return lines
+
+_METRIC_TYPES = {cls.kind: cls for cls in (Counter, Gauge, Histogram)}
+
+def _from_snapshot(name: str, data: Dict[str, Any]) -> Metric:
+    """按快照创建同类型的空指标"""
+    cls = _METRIC_TYPES[data['kind']]
+    if cls is Histogram:
+        return Histogram(name, data['help'], tuple(data['labels']), tuple(data['buckets']))
+    return cls(name, data['help'], tuple(data['labels']))
+
+class MetricsRegistry:
+    """进程内指标注册表，同名指标只创建一次
+
+    批量模式下工作进程定期把 snapshot() 发给主进程，主进程用 merge_remote 保存每个进程最新的快照，
+    expose 时与本进程的取值相加，一个导出端即可看到所有进程的指标。
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._remote: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls: type, name: str, help_text: str, labels: Tuple[str, ...],
+                       **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labels, **kwargs)
+            elif not isinstance(metric, cls) or metric.label_names != tuple(labels):
+                raise ValueError(f'Metric {name} is already registered with a different type or labels')
+            return metric
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labels)
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labels, buckets=buckets)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """所有指标的快照"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def merge_remote(self, source: str, snapshot: Dict[str, Dict[str, Any]]) -> None:
+        """保存来源进程（如工作进程 pid）最新的累计快照，替换该来源之前的快照"""
+        with self._lock:
+            self._remote[source] = snapshot
+
+    def _merged(self) -> List[Metric]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            remote = list(self._remote.values())
+        if not remote:
+            return list(metrics.values())
+
+        merged: Dict[str, Metric] = {}
+        for name, metric in metrics.items():
+            data = metric.snapshot()
+            merged[name] = _from_snapshot(name, data)
+            merged[name].merge(data['values'])
+        for snapshot in remote:
+            for name, data in snapshot.items():
+                target = merged.get(name)
+                if target is None:
+                    target = merged[name] = _from_snapshot(name, data)
+                # 类型、标签或分桶不一致的快照无法相加，跳过
+                if (target.kind != data['kind'] or target.label_names != tuple(data['labels'])
+                        or getattr(target, 'buckets', ())[:-1] != tuple(data.get('buckets', ()))):
+                    continue
+                target.merge(data['values'])
+        return list(merged.values())
+
+    def expose(self) -> str:
+        """Prometheus 文本格式（包含 merge_remote 收到的其它进程的取值）"""
+        metrics = sorted(self._merged(), key=lambda metric: metric.name)
+        return '\n'.join(metric.expose() for metric in metrics) + '\n'
+
+REGISTRY = MetricsRegistry()
+
+class MetricsHTTPServer:
+    """在后台线程中提供 /metrics 的 HTTP 服务，默认只监听本机"""
+
+    def __init__(self, port: int, host: str = '127.0.0.1', registry: Optional[MetricsRegistry] = None):
+        # http.server 导入较慢，只在开启 HTTP 服务时导入
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics_registry = registry or REGISTRY
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics_registry.expose().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True)
+
+    def start(self) -> 'MetricsHTTPServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+class TextfileWriter:
+    """按固定间隔把指标原子地写入文件，供 node_exporter 的 textfile collector 采集"""
+
+    def __init__(self, path: str, interval: float = 15.0, registry: Optional[MetricsRegistry] = None):
+        self.path = os.path.abspath(path)
+        self.interval = interval
+        self.registry = registry or REGISTRY
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-textfile', daemon=True)
+
+    def start(self) -> 'TextfileWriter':
+        self._thread.start()
+        return self
+
+    def write(self) -> None:
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.registry.expose())
+        os.replace(tmp_path, self.path)
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def stop(self) -> None:
+        """停止定时写入，并写出最终结果"""
+        self._stopped.set()
+        self._thread.join()
+        self.write()
@@ -0,0 +1,131 @@
+import asyncio
+import contextvars
+import heapq
+import time
+from typing import Dict, Any, Callable, List, Tuple
+
+# 当前任务最近一次被虚拟时钟唤醒时的因果键，之后发起的等待（以及此后创建的任务）继承它
+_CAUSE: contextvars.ContextVar = contextvars.ContextVar('virtual_pacer_cause', default=())
+
+class Pacer:
+    """节奏控制：替代工作流和角色中写死的 asyncio.sleep"""
+
+    mode = 'real'
+
+    async def pause(self, seconds: float, label: str = '') -> None:
+        """模拟一段耗时"""
+        await asyncio.sleep(seconds)
+
+    def now(self) -> float:
+        """当前时间戳（虚拟时钟下为模拟时间）"""
+        return time.time()
+
+    async def offload(self, func: Callable[..., Any], *args: Any) -> Any:
+        """在线程池中运行阻塞的磁盘 I/O，不占用事件循环"""
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+class RealPacer(Pacer):
+    """真实等待，保持现有的用户体验"""
+
+    mode = 'real'
+
+class NoPacer(Pacer):
+    """不等待，只让出一次事件循环，用于最大吞吐"""
+
+    mode = 'none'
+
+    async def pause(self, seconds: float, label: str = '') -> None:
+        await asyncio.sleep(0)
+
+class VirtualClockPacer(Pacer):
+    """虚拟时钟：立即推进时间，但按到期顺序唤醒并记录模拟时间线
+
+    每次唤醒最早到期的等待者；唤醒前先空转若干轮事件循环，让其它协程都进入下一次 pause。
+    到期时间相同时模拟真实计时器的先后：真实的到期时间等于发起 pause 的时刻加时长，而发起时刻
+    继承了唤醒该任务的那次等待的延迟，因此按因果链比较（唤醒者的次序在前，同一次唤醒内按发起顺序）。
+    同一次唤醒之后（同一轮活动中）发起、到期时间相同的等待在真实事件循环中会在同一轮一起到期，这里也一起唤醒。
+    真实等待的先后本身取决于毫秒级的执行耗时，这里只能近似，消息顺序通常与 real 一致，但不保证完全相同。
+    """
+
+    mode = 'virtual'
+
+    def __init__(self, settle_ticks: int = 20):
+        self.settle_ticks = settle_ticks
+        self.epoch = time.time()
+        self.elapsed = 0.0
+        self.timeline: List[Dict[str, Any]] = []
+        # (到期时间, 因果键, 发起时所在的唤醒轮次, future)；因果键各不相同，比较不会用到后两项
+        self._waiters: List[Tuple[float, Tuple[int, ...], int, asyncio.Future]] = []
+        self._seq = 0
+        self._round = 0
+        self._activity = 0
+        # 正在线程池中运行的 I/O，完成前不推进时钟
+        self._offloaded = 0
+        self._advancer = None
+
+    def now(self) -> float:
+        return self.epoch + self.elapsed
+
+    async def pause(self, seconds: float, label: str = '') -> None:
+        start = self.elapsed
+        if seconds <= 0:
+            await asyncio.sleep(0)
+        else:
+            loop = asyncio.get_running_loop()
+            waiter = loop.create_future()
+            cause = _CAUSE.get() + (self._seq,)
+            # 取整消除连续累加小数（如 10 次 0.1 秒）的浮点误差，使其与同一时刻到期的等待按相同时间比较
+            heapq.heappush(self._waiters, (round(start + seconds, 9), cause, self._round, waiter))
+            self._seq += 1
+            self._activity += 1
+            if self._advancer is None or self._advancer.done():
+                self._advancer = loop.create_task(self._advance())
+            await waiter
+            _CAUSE.set(cause)
+
+        self.timeline.append({
+            'label': label,
+            'start': start,
+            'end': self.elapsed
+        })
+
+    async def offload(self, func: Callable[..., Any], *args: Any) -> Any:
+        self._offloaded += 1
+        try:
+            return await super().offload(func, *args)
+        finally:
+            self._offloaded -= 1
+            self._activity += 1
+
+    async def _advance(self) -> None:
+        while self._waiters:
+            # 等待其它协程运行到下一次 pause
+            quiet = 0
+            while quiet < self.settle_ticks:
+                mark = self._activity
+                await asyncio.sleep(0)
+                quiet = quiet + 1 if mark == self._activity and not self._offloaded else 0
+
+            deadline, _, issued, waiter = heapq.heappop(self._waiters)
+            batch = [waiter]
+            while self._waiters and self._waiters[0][0] == deadline and self._waiters[0][2] == issued:
+                batch.append(heapq.heappop(self._waiters)[3])
+            self.elapsed = max(self.elapsed, deadline)
+            self._round += 1
+            for waiter in batch:
+                if not waiter.done():
+                    waiter.set_result(None)
+            self._activity += 1
+
+PACING_MODES = {
+    'real': RealPacer,
+    'none': NoPacer,
+    'virtual': VirtualClockPacer
+}
+
+def create_pacer(mode: str = 'real') -> Pacer:
+    """按模式名创建节奏控制器"""
+    try:
+        return PACING_MODES[mode]()
+    except KeyError:
+        raise ValueError(f'Unknown pacing mode: {mode}') from None
@@ -0,0 +1,195 @@
+import asyncio
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, AsyncIterator, Set
+
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), '..', 'profiles')
+PROFILE_MODES = ('full', 'sample')
+
+# cProfile 和 tracemalloc 都是进程级的，同一时间只允许一个阶段做完整剖析；
+# asyncio.Lock 绑定创建它的事件循环，--batch 的 worker 每个任务块运行一个新循环，因此按循环分别创建
+_full_profile_locks: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]' = weakref.WeakKeyDictionary()
+
+def _full_profile_lock() -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    lock = _full_profile_locks.get(loop)
+    if lock is None:
+        lock = _full_profile_locks[loop] = asyncio.Lock()
+    return lock
+
+class NullProfiler:
+    """未开启剖析时使用"""
+
+    enabled = False
+    requires_serial = False
+
+    @asynccontextmanager
+    async def stage(self, name: str) -> AsyncIterator[None]:
+        yield
+
+    def close(self) -> None:
+        pass
+
+class StageProfiler:
+    """完整剖析：每个阶段用 cProfile 记录调用耗时，用 tracemalloc 记录内存分配
+
+    每个阶段写出 <stage>.prof（可用 pstats / snakeviz 查看）和 <stage>.alloc.txt（分配最多的代码行）。
+    cProfile 按线程记录，事件循环中同时运行的协程都会计入，因此剖析时阶段串行运行。
+    """
+
+    enabled = True
+    requires_serial = True
+
+    def __init__(self, output_dir: str, top_allocations: int = 25):
+        self.output_dir = output_dir
+        self.top_allocations = top_allocations
+        self.files: Dict[str, List[str]] = {}
+
+    @asynccontextmanager
+    async def stage(self, name: str) -> AsyncIterator[None]:
+        async with _full_profile_lock():
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+                elapsed = time.perf_counter() - started
+                after = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+                self._write(name, profiler, before, after, elapsed, peak)
+
+    def _write(self, name: str, profiler: cProfile.Profile, before: tracemalloc.Snapshot,
+               after: tracemalloc.Snapshot, elapsed: float, peak: int) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        prof_path = os.path.join(self.output_dir, f'{name}.prof')
+        profiler.dump_stats(prof_path)
+
+        # 排除 tracemalloc 自身的分配
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        stats = after.filter_traces(filters).compare_to(before.filter_traces(filters), 'lineno')
+        lines = [
+            f'# stage: {name}',
+            f'# wall time: {elapsed * 1000:.1f} ms',
+            f'# peak traced memory: {peak / 1024:.1f} KiB',
+            f'# top {self.top_allocations} allocation sites by size growth',
+        ]
+        lines.extend(str(stat) for stat in stats[:self.top_allocations])
+        alloc_path = os.path.join(self.output_dir, f'{name}.alloc.txt')
+        with open(alloc_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        self.files[name] = [prof_path, alloc_path]
+
+    def close(self) -> None:
+        pass
+
+class SamplingProfiler:
+    """采样剖析：后台线程按 rate 次/秒采样事件循环线程的调用栈，开销低，可在生产环境常开
+
+    样本计入采样时所有正在运行的阶段，写出 flamegraph 可读的折叠栈 <stage>.stacks.txt。
+    阶段并发运行，不需要串行。
+    """
+
+    enabled = True
+    requires_serial = False
+
+    def __init__(self, output_dir: str, rate: float = 100.0):
+        self.output_dir = output_dir
+        self.interval = 1.0 / max(rate, 0.1)
+        self.files: Dict[str, List[str]] = {}
+        self._active: Set[str] = set()
+        self._samples: Dict[str, Counter] = {}
+        self._stage_samples: Dict[str, int] = {}
+        self._thread_id: Optional[int] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._thread_id = threading.get_ident()
+            self._thread = threading.Thread(target=self._run, name='stage-sampler', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            collapsed = ';'.join(reversed(stack))
+            with self._lock:
+                for name in active:
+                    self._samples.setdefault(name, Counter())[collapsed] += 1
+
+    @asynccontextmanager
+    async def stage(self, name: str) -> AsyncIterator[None]:
+        self._ensure_started()
+        with self._lock:
+            self._active.add(name)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active.discard(name)
+                samples = self._samples.pop(name, Counter())
+            self._write(name, samples)
+
+    def _write(self, name: str, samples: Counter) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f'{name}.stacks.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{stack} {count}\n')
+        self.files[name] = [path]
+
+    def close(self) -> None:
+        """停止采样线程"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+def create_profiler(mode: Optional[str], project_id: str, profile_dir: Optional[str] = None,
+                    sample_rate: float = 100.0) -> Any:
+    """按模式创建剖析器，输出目录为 <profile_dir>/<project_id>/<时间戳>-<随机后缀>"""
+    if not mode:
+        return NullProfiler()
+    if mode not in PROFILE_MODES:
+        raise ValueError(f'Unknown profile mode: {mode}')
+
+    # 随机后缀避免同一项目在一秒内的多次运行写入同一目录
+    run_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    output_dir = os.path.join(profile_dir or PROFILE_DIR, _safe_name(project_id), run_name)
+    if mode == 'sample':
+        return SamplingProfiler(output_dir, sample_rate)
+    return StageProfiler(output_dir)
+
+def _safe_name(name: str) -> str:
+    # 项目 ID 来自客户端，不能让它跳出剖析目录
+    name = re.sub(r'[^\w.-]', '_', name)
+    return '_' if name in ('', '.', '..') else name
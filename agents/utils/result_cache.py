@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Any, Optional, Set
+
+from utils.metrics import REGISTRY
+
+CACHE_LOOKUPS = REGISTRY.counter('agent_result_cache_lookups_total', 'Result cache lookups', ('result',))
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', 'cache', 'results.sqlite3')
+
+def normalize_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留影响产出的字段，并补齐默认值"""
+    return {
+        'name': config.get('name', '未命名项目'),
+        'projectType': config.get('projectType'),
+        'description': config.get('description'),
+        'requirements': [str(req) for req in config.get('requirements', [])]
+    }
+
+def config_key(config: Dict[str, Any], generator_version: str) -> str:
+    """规范化配置与生成器版本的摘要"""
+    canonical = json.dumps(
+        {'config': normalize_config(config), 'generator': generator_version},
+        ensure_ascii=False, sort_keys=True, separators=(',', ':')
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """整个工作流产出的持久化缓存（SQLite），按条数、总大小和存活时间淘汰"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1000,
+                 max_bytes: int = 256 * 1024 * 1024, max_age: float = 7 * 24 * 3600):
+        self.path = os.path.abspath(path or DEFAULT_CACHE_PATH)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的运行结果（清单，文件内容在内容寻址存储中），过期或不存在时返回 None"""
+        now = time.time()
+        row = self._db.execute(
+            'SELECT result FROM results WHERE key = ? AND created_at >= ?',
+            (key, now - self.max_age)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            CACHE_LOOKUPS.inc(result='miss')
+            return None
+
+        self._db.execute('UPDATE results SET last_access = ? WHERE key = ?', (now, key))
+        self.hits += 1
+        CACHE_LOOKUPS.inc(result='hit')
+        return json.loads(row[0])
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """保存运行结果并执行淘汰"""
+        data = json.dumps(result, ensure_ascii=False)
+        now = time.time()
+        self._db.execute(
+            'INSERT OR REPLACE INTO results (key, result, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)',
+            (key, data, len(data.encode('utf-8')), now, now)
+        )
+        self.evict()
+
+    def evict(self) -> None:
+        """删除过期条目，再按最近访问时间淘汰超出条数或大小上限的条目"""
+        self._db.execute('DELETE FROM results WHERE created_at < ?', (time.time() - self.max_age,))
+
+        count, total = self._db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        for key, size in self._db.execute('SELECT key, size FROM results ORDER BY last_access').fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._db.execute('DELETE FROM results WHERE key = ?', (key,))
+            count -= 1
+            total -= size
+
+    def referenced_hashes(self) -> Set[str]:
+        """缓存的清单引用的所有内容摘要（使用独立连接，可以在其它线程调用）"""
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            rows = db.execute('SELECT result FROM results').fetchall()
+        finally:
+            db.close()
+        return {record['contentHash'] for (result,) in rows
+                for record in json.loads(result).get('manifest', {}).get('files', [])}
+
+    def close(self) -> None:
+        self._db.close()
+
+_default_cache: Optional[ResultCache] = None
+
+def get_result_cache() -> ResultCache:
+    """进程内共享的结果缓存"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
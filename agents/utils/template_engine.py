@@ -0,0 +1,145 @@
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from utils.metrics import REGISTRY
+
+TEMPLATE_RENDERS = REGISTRY.counter('agent_template_renders_total', 'Template renders by render cache result', ('result',))
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), '..', 'templates')
+
+# 模板中的插槽写作 [[ name ]]，避免与 Vue 的 {{ }} 和 JS 的 ${ } 冲突
+SLOT_PATTERN = re.compile(r'\[\[\s*(\w+)\s*\]\]')
+
+class CompiledTemplate:
+    """编译后的模板：静态片段与插槽交替排列"""
+
+    def __init__(self, template_id: str, source: str):
+        self.template_id = template_id
+        parts = SLOT_PATTERN.split(source)
+        # split 的结果为 静态, 插槽, 静态, 插槽, ..., 静态
+        self.segments: Tuple[str, ...] = tuple(parts[0::2])
+        self.slots: Tuple[str, ...] = tuple(parts[1::2])
+
+    def check(self, values: Dict[str, Any]) -> None:
+        missing = [slot for slot in self.slots if slot not in values]
+        if missing:
+            raise KeyError(f'Template {self.template_id} is missing values for: {missing}')
+
+    def render(self, values: Dict[str, Any]) -> str:
+        self.check(values)
+        pieces: List[str] = [self.segments[0]]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            pieces.append(str(values[slot]))
+            pieces.append(segment)
+        return ''.join(pieces)
+
+    def iter_render(self, values: Dict[str, Any]) -> Iterator[str]:
+        """按顺序逐段产出渲染结果（静态片段和插槽值），不拼接完整内容"""
+        self.check(values)
+        if self.segments[0]:
+            yield self.segments[0]
+        for slot, segment in zip(self.slots, self.segments[1:]):
+            value = str(values[slot])
+            if value:
+                yield value
+            if segment:
+                yield segment
+
+class TemplateEngine:
+    """模板渲染引擎：启动时编译模板目录，渲染结果按 (模板ID, 输入摘要) 做有界 LRU 缓存"""
+
+    def __init__(self, template_dir: Optional[str] = None, cache_size: int = 512):
+        self.template_dir = template_dir or TEMPLATE_DIR
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._source_hashes: Dict[str, str] = {}
+        self._cache: 'OrderedDict[Tuple[str, str], str]' = OrderedDict()
+        self.load_directory(self.template_dir)
+
+    def load_directory(self, directory: str) -> None:
+        """编译目录下所有 .tmpl 文件，模板ID为去掉扩展名的相对路径"""
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if not name.endswith('.tmpl'):
+                    continue
+                path = os.path.join(root, name)
+                template_id = os.path.relpath(path, directory)[:-len('.tmpl')].replace(os.sep, '/')
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.register(template_id, f.read())
+
+    def register(self, template_id: str, source: str) -> CompiledTemplate:
+        template = CompiledTemplate(template_id, source)
+        self._templates[template_id] = template
+        self._source_hashes[template_id] = hashlib.sha256(source.encode('utf-8')).hexdigest()
+        return template
+
+    def fingerprint(self) -> str:
+        """所有模板源码的摘要，模板变化时随之变化"""
+        digest = hashlib.sha256()
+        for template_id in sorted(self._source_hashes):
+            digest.update(f'{template_id}={self._source_hashes[template_id]};'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, template_id: str) -> CompiledTemplate:
+        try:
+            return self._templates[template_id]
+        except KeyError:
+            raise KeyError(f'Unknown template: {template_id}') from None
+
+    @staticmethod
+    def _input_hash(template: CompiledTemplate, values: Dict[str, Any]) -> str:
+        digest = hashlib.blake2b(digest_size=16)
+        for slot in sorted(set(template.slots)):
+            encoded = str(values[slot]).encode('utf-8')
+            digest.update(f'{slot}:{len(encoded)}:'.encode('utf-8'))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def render(self, template_id: str, **values: Any) -> str:
+        """渲染模板，相同输入直接返回缓存结果"""
+        template = self.get(template_id)
+        template.check(values)
+        key = (template_id, self._input_hash(template, values))
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            TEMPLATE_RENDERS.inc(result='hit')
+            return cached
+
+        self.misses += 1
+        TEMPLATE_RENDERS.inc(result='miss')
+        result = template.render(values)
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def render_stream(self, template_id: str, **values: Any) -> Iterator[str]:
+        """流式渲染模板：逐段产出，不经过渲染缓存"""
+        TEMPLATE_RENDERS.inc(result='stream')
+        return self.get(template_id).iter_render(values)
+
+    def stats(self) -> Dict[str, int]:
+        """缓存命中统计"""
+        return {
+            'templates': len(self._templates),
+            'cached': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+_default_engine: Optional[TemplateEngine] = None
+
+def get_template_engine() -> TemplateEngine:
+    """进程内共享的模板引擎"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = TemplateEngine()
+    return _default_engine
@@ -0,0 +1,113 @@
+import contextvars
+import functools
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Any, Optional, Iterator, Callable
+
+from utils.metrics import REGISTRY
+
+ROLE_CALL_SECONDS = REGISTRY.histogram('agent_role_call_seconds', 'Duration of role method calls', ('method',))
+
+# 当前任务中最内层的 span；asyncio 任务创建时复制上下文，所以并发阶段互不干扰
+_current_span: 'contextvars.ContextVar[Optional[Span]]' = contextvars.ContextVar('current_span', default=None)
+
+class Span:
+    """一段被计时的工作：墙钟时间、CPU 时间、期间发送的消息数和字节数
+
+    CPU 时间为进程 CPU 时间，同一事件循环中并发运行的 span 会互相计入。
+    """
+
+    __slots__ = ('name', 'parent', 'wall_start', 'cpu_start', 'wall', 'cpu',
+                 'messages', 'bytes', 'children')
+
+    def __init__(self, name: str, parent: Optional['Span'] = None):
+        self.name = name
+        self.parent = parent
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.messages = 0
+        self.bytes = 0
+        # 子 span 按名称汇总：{name: {'count', 'wall', 'cpu'}}
+        self.children: Dict[str, Dict[str, float]] = {}
+
+    def add_message(self, size: int) -> None:
+        """计入一条消息，并向上累加到所有父 span"""
+        span: Optional[Span] = self
+        while span is not None:
+            span.messages += 1
+            span.bytes += size
+            span = span.parent
+
+    def finish(self) -> None:
+        self.wall = time.perf_counter() - self.wall_start
+        self.cpu = time.process_time() - self.cpu_start
+        if self.parent is not None:
+            child = self.parent.children.setdefault(self.name, {'count': 0, 'wall': 0.0, 'cpu': 0.0})
+            child['count'] += 1
+            child['wall'] += self.wall
+            child['cpu'] += self.cpu
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'wallMs': round(self.wall * 1000, 3),
+            'cpuMs': round(self.cpu * 1000, 3),
+            'messages': self.messages,
+            'bytes': self.bytes,
+            'children': {
+                name: {
+                    'count': int(child['count']),
+                    'wallMs': round(child['wall'] * 1000, 3),
+                    'cpuMs': round(child['cpu'] * 1000, 3)
+                }
+                for name, child in self.children.items()
+            }
+        }
+
+class Tracer:
+    """记录 span 的追踪器"""
+
+    enabled = True
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Span]:
+        span = Span(name, _current_span.get())
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+            span.finish()
+
+class NullTracer:
+    """关闭追踪时使用：span() 不做任何记录"""
+
+    enabled = False
+
+    def span(self, name: str):
+        return nullcontext()
+
+NULL_TRACER = NullTracer()
+
+def create_tracer(enabled: bool):
+    return Tracer() if enabled else NULL_TRACER
+
+def current_span() -> Optional[Span]:
+    """当前任务中最内层的 span，未开启追踪时为 None"""
+    return _current_span.get()
+
+def traced(name: str) -> Callable:
+    """为角色的异步方法计时：总是记入 agent_role_call_seconds，开启追踪时另外记录 span（追踪器取自实例的 tracer 属性）"""
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            tracer = self.tracer
+            with ROLE_CALL_SECONDS.time(method=name):
+                if not tracer.enabled:
+                    return await func(self, *args, **kwargs)
+                with tracer.span(name):
+                    return await func(self, *args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,87 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+
+from utils.artifact_store import ArtifactStore
+
+DEFAULT_WORKSPACE_DIR = os.path.join(os.path.dirname(__file__), '..', 'workspaces')
+# 运行结束时写入运行目录的清单文件，可作为下一次增量运行的 --previous-manifest
+MANIFEST_FILE = '.manifest.json'
+
+class RunWorkspace:
+    """单次运行的磁盘工作区：<root>/<project_id>/<时间戳>-<随机后缀>/<filePath>
+
+    文件在生成时从内容寻址存储复制到工作区（不使用硬链接，修改工作区文件不会影响共享的存储），
+    内存中只保留不含内容的文件记录。目录在写入第一个文件时才创建，同时删除该项目较早的运行目录，
+    只保留最近 keep_runs 个（包括本次）。记录中的 path 是相对 root 的路径，不暴露服务器上的绝对路径。
+    """
+
+    def __init__(self, project_id: str, artifact_store: ArtifactStore, root: Optional[str] = None,
+                 keep_runs: int = 5):
+        self.artifact_store = artifact_store
+        self.root = os.path.abspath(root or DEFAULT_WORKSPACE_DIR)
+        self.keep_runs = max(1, keep_runs)
+        # 相对 root 的运行标识：<project_id>/<时间戳>-<随机后缀>
+        self.run_id = f"{_safe_name(project_id)}/{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.path = os.path.join(self.root, self.run_id)
+        self.records: List[Dict[str, Any]] = []
+        # add 可能同时在多个线程中运行，第一次创建运行目录（和清理旧目录）只做一次
+        self._lock = threading.Lock()
+
+    def path_for(self, file_path: str) -> str:
+        """文件在工作区中的绝对路径，拒绝跳出工作区的路径"""
+        relative = os.path.normpath(file_path.lstrip('/\\'))
+        if relative.startswith('..') or os.path.isabs(relative):
+            raise ValueError(f'File path escapes the workspace: {file_path}')
+        return os.path.join(self.path, relative)
+
+    def add(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """把存储中的内容放到工作区，返回带 path 的轻量记录"""
+        target = self.path_for(record['filePath'])
+        source = self.artifact_store.path_for(record['contentHash'])
+        with self._lock:
+            if not os.path.isdir(self.path):
+                self.prune()
+                os.makedirs(self.path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+
+        entry = {
+            'fileName': record['fileName'],
+            'filePath': record['filePath'],
+            'fileType': record['fileType'],
+            'createdBy': record['createdBy'],
+            'contentHash': record['contentHash'],
+            'size': record['size'],
+            'path': os.path.relpath(target, self.root).replace(os.sep, '/')
+        }
+        self.records.append(entry)
+        return entry
+
+    def write_manifest(self, manifest: Dict[str, Any]) -> str:
+        """把本次运行的清单写入运行目录，返回相对 root 的路径"""
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, MANIFEST_FILE)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        return f'{self.run_id}/{MANIFEST_FILE}'
+
+    def prune(self) -> None:
+        """删除同一项目较早的运行目录，为本次运行留出一个名额（运行目录名按时间排序）"""
+        project_dir = os.path.dirname(self.path)
+        try:
+            runs = sorted(name for name in os.listdir(project_dir)
+                          if os.path.isdir(os.path.join(project_dir, name)))
+        except FileNotFoundError:
+            return
+        for name in runs[:max(0, len(runs) - (self.keep_runs - 1))]:
+            shutil.rmtree(os.path.join(project_dir, name), ignore_errors=True)
+
+def _safe_name(name: str) -> str:
+    name = re.sub(r'[^\w.-]', '_', name)
+    return '_' if name in ('', '.', '..') else name
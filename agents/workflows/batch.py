@@ -0,0 +1,248 @@
+import asyncio
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+from utils.message_sender import MessageSender, OutputChannel, encode_message
+from utils.compression import create_compressor
+from utils.logger import setup_logger, close_project_loggers
+from utils.metrics import REGISTRY
+from workflows.daemon import job_workflow_options
+
+# 每个任务的结果: (projectId, 状态, 耗时秒数)
+JobResult = Tuple[str, str, float]
+
+class QueueOutputChannel(OutputChannel):
+    """工作进程的输出通道：同一轮事件循环内的消息合并为一批，放入跨进程队列交给主进程输出"""
+
+    def __init__(self, out_queue: Any):
+        super().__init__()
+        self._queue = out_queue
+        self._pending: List[str] = []
+        self._flush_handle: Optional[asyncio.Handle] = None
+
+    def put(self, data: Dict[str, Any]) -> None:
+        self._pending.append(encode_message(data))
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        if self._pending:
+            lines, self._pending = self._pending, []
+            self._queue.put(lines)
+
+    async def aclose(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush()
+
+def load_jobs(path: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """读取 JSON-lines 任务文件，返回 (有效任务, 错误信息)；任务格式与常驻模式的 start 任务相同"""
+    jobs: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError('job must be a JSON object')
+            except ValueError as e:
+                errors.append(f'Invalid job JSON on line {number}: {str(e)}')
+                continue
+            if not job.get('projectId'):
+                errors.append(f'Job on line {number} is missing projectId')
+                continue
+            jobs.append(job)
+    return jobs, errors
+
+def percentile(values: List[float], fraction: float) -> float:
+    """最近秩百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+def run_job_chunk(agent_factory: Callable[..., Any], options: Dict[str, Any],
+                  jobs: List[Dict[str, Any]], concurrency: int, out_queue: Any,
+                  compress: Optional[str] = None, compress_threshold: int = 4096,
+                  metrics_interval: Optional[float] = None) -> List[JobResult]:
+    """工作进程入口：在独立的事件循环中并发运行一组任务
+
+    metrics_interval 不为 None 时，每隔这么多秒以及任务块结束时把本进程的指标快照放入队列，由主进程合并导出。
+    """
+    return asyncio.run(_run_chunk(agent_factory, options, jobs, concurrency, out_queue,
+                                  compress, compress_threshold, metrics_interval))
+
+def _send_metrics(out_queue: Any) -> None:
+    out_queue.put({'pid': os.getpid(), 'metrics': REGISTRY.snapshot()})
+
+async def _report_metrics(out_queue: Any, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        _send_metrics(out_queue)
+
+async def _run_chunk(agent_factory: Callable[..., Any], options: Dict[str, Any],
+                     jobs: List[Dict[str, Any]], concurrency: int, out_queue: Any,
+                     compress: Optional[str], compress_threshold: int,
+                     metrics_interval: Optional[float] = None) -> List[JobResult]:
+    channel = QueueOutputChannel(out_queue)
+    # 在工作进程中压缩，主进程只转发已编码的行
+    channel.compressor = create_compressor(compress, compress_threshold)
+    slots = asyncio.Semaphore(max(1, concurrency))
+    logger = setup_logger(f'batch_worker_{os.getpid()}')
+
+    async def run_one(job: Dict[str, Any]) -> JobResult:
+        project_id = str(job['projectId'])
+        sender = MessageSender(project_id, channel)
+        async with slots:
+            started = time.perf_counter()
+            status = 'failed'
+            try:
+                agent = agent_factory(project_id, job.get('config') or {}, sender,
+                                      job_workflow_options(options, job))
+                await agent.start_development()
+                status = 'completed'
+            except Exception as e:
+                # ProjectAgent 已经发送过错误消息，这里只记录日志
+                logger.error(f"Job {project_id} failed: {str(e)}")
+            finally:
+                close_project_loggers(project_id)
+            duration = time.perf_counter() - started
+            await sender.send_message({
+                'type': 'job_status',
+                'payload': {
+                    'status': status,
+                    'durationMs': round(duration * 1000, 1),
+                    'workerPid': os.getpid()
+                }
+            })
+            return project_id, status, duration
+
+    reporter = None
+    if metrics_interval is not None:
+        reporter = asyncio.create_task(_report_metrics(out_queue, metrics_interval))
+    try:
+        return list(await asyncio.gather(*(run_one(job) for job in jobs)))
+    finally:
+        await channel.aclose()
+        # 共享的模型提供方的连接池属于这次的事件循环，在循环结束前关闭（只在角色用过它时才会加载）
+        provider = sys.modules.get('llm.provider')
+        if provider is not None:
+            await provider.close_provider()
+        if reporter is not None:
+            reporter.cancel()
+            _send_metrics(out_queue)
+
+class BatchRunner:
+    """批量模式：把大量项目任务分块分发到进程池
+
+    每个工作进程运行自己的事件循环，同时处理 worker_concurrency 个项目；
+    所有消息带 projectId，经跨进程队列回到主进程按批写出。结束时发送 batch_summary，
+    包含吞吐量和单任务耗时的百分位数。metrics_interval 不为 None 时工作进程的指标
+    经同一队列合并到主进程的注册表，主进程的 --metrics-port / --metrics-file 导出全部进程的指标。
+    """
+
+    def __init__(self, agent_factory: Callable[..., Any], options: Dict[str, Any],
+                 workers: Optional[int] = None, worker_concurrency: int = 4,
+                 write: Optional[Callable[[List[str]], None]] = None,
+                 compress: Optional[str] = None, compress_threshold: int = 4096,
+                 metrics_interval: Optional[float] = None):
+        # agent_factory 需要能被 pickle（模块级的类或函数），在工作进程中构造智能体
+        self.agent_factory = agent_factory
+        self.options = options
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.worker_concurrency = max(1, worker_concurrency)
+        self.compress = compress
+        self.compress_threshold = compress_threshold
+        self.metrics_interval = metrics_interval
+        self._write = write or self._write_stdout
+        self.logger = setup_logger('batch_runner')
+
+    @staticmethod
+    def _write_stdout(lines: List[str]) -> None:
+        sys.stdout.write('\n'.join(lines) + '\n')
+        sys.stdout.flush()
+
+    def split(self, jobs: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """把任务切成若干块，块数为工作进程数的数倍，便于负载均衡"""
+        if not jobs:
+            return []
+        size = max(1, math.ceil(len(jobs) / (self.workers * 4)))
+        return [jobs[start:start + size] for start in range(0, len(jobs), size)]
+
+    def _forward(self, out_queue: Any, finished: threading.Event) -> None:
+        """把工作进程的消息写到输出（指标快照合并到注册表），直到所有任务块完成且队列为空"""
+        while True:
+            try:
+                item = out_queue.get(timeout=0.1)
+            except queue.Empty:
+                if finished.is_set():
+                    return
+                continue
+            if isinstance(item, dict):
+                REGISTRY.merge_remote(f"worker-{item['pid']}", item['metrics'])
+            else:
+                self._write(item)
+
+    async def run(self, jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """运行全部任务，返回汇总信息"""
+        loop = asyncio.get_running_loop()
+        chunks = self.split(jobs)
+        results: List[JobResult] = []
+        started = time.perf_counter()
+
+        with Manager() as manager, ProcessPoolExecutor(max_workers=min(self.workers, len(chunks)) or 1) as pool:
+            out_queue = manager.Queue()
+            finished = threading.Event()
+            forwarder = loop.run_in_executor(None, self._forward, out_queue, finished)
+
+            futures = [
+                loop.run_in_executor(pool, run_job_chunk, self.agent_factory, self.options,
+                                     chunk, self.worker_concurrency, out_queue,
+                                     self.compress, self.compress_threshold, self.metrics_interval)
+                for chunk in chunks
+            ]
+            for chunk, future in zip(chunks, futures):
+                try:
+                    results.extend(await future)
+                except Exception as e:
+                    # 工作进程异常退出时，该块中的任务全部记为失败
+                    self.logger.error(f"Batch worker failed: {str(e)}")
+                    results.extend((str(job['projectId']), 'failed', 0.0) for job in chunk)
+
+            finished.set()
+            await forwarder
+
+        return self.summarize(results, time.perf_counter() - started)
+
+    def summarize(self, results: List[JobResult], wall_seconds: float) -> Dict[str, Any]:
+        durations = [duration for _, status, duration in results if status == 'completed']
+        completed = len(durations)
+        return {
+            'jobs': len(results),
+            'completed': completed,
+            'failed': len(results) - completed,
+            'workers': self.workers,
+            'workerConcurrency': self.worker_concurrency,
+            'wallSeconds': round(wall_seconds, 3),
+            'jobsPerSecond': round(completed / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+            'latencyMs': {
+                'p50': round(percentile(durations, 0.50) * 1000, 1),
+                'p90': round(percentile(durations, 0.90) * 1000, 1),
+                'p99': round(percentile(durations, 0.99) * 1000, 1),
+                'max': round(max(durations, default=0.0) * 1000, 1),
+                'mean': round(sum(durations) / completed * 1000, 1) if completed else 0.0
+            }
+        }
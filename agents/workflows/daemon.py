@@ -0,0 +1,318 @@
+import asyncio
+import json
+import os
+import sys
+from typing import Dict, Any, Callable, Optional, Set
+
+from utils.message_sender import MessageSender, BatchedOutputChannel, OutputChannel
+from utils.logger import setup_logger, close_project_loggers
+from utils.artifact_store import ArtifactStore, get_artifact_store
+from utils.compression import PayloadCompressor, available_encodings, create_compressor, negotiate
+
+def job_workflow_options(options: Dict[str, Any], job: Dict[str, Any]) -> Dict[str, Any]:
+    """用任务中的 pacing / noCache / previousManifest / resume / streamFiles / trace / profile 字段覆盖默认的工作流选项"""
+    profile = job.get('profile', options.get('profile'))
+    if profile is True:
+        profile = 'full'
+    return {
+        **options,
+        'pacing': job.get('pacing', options.get('pacing', 'real')),
+        'use_cache': options.get('use_cache', True) and not job.get('noCache', False),
+        'previous_manifest': job.get('previousManifest'),
+        'resume': job.get('resume', options.get('resume', False)),
+        'stream_files': job.get('streamFiles', options.get('stream_files', False)),
+        'trace': job.get('trace', options.get('trace', False)),
+        'profile': profile or None,
+        'profile_sample_rate': job.get('profileSampleRate', options.get('profile_sample_rate', 100.0))
+    }
+
+class AgentDaemon:
+    """常驻多项目智能体服务
+
+    从 stdin（或 Unix socket）按行读取 JSON 任务，在同一个事件循环中并发运行多个项目，
+    所有输出消息都带有 projectId。支持的任务格式:
+        {"action": "start", "projectId": "...", "config": {...}}   (action 可省略)
+        {"action": "cancel", "projectId": "..."}
+        {"action": "known_blobs", "hashes": ["..."]}   声明消费端已有的内容摘要
+        {"action": "fetch_blob", "hash": "..."}        取回内容，回复 blob 消息
+        {"action": "hello", "accept": ["zstd", "zlib"], "compressThreshold": 4096}
+                                                       协商负载压缩，回复 hello 消息给出选中的编码
+    start 任务可以带 pacing 字段覆盖命令行的节奏模式，noCache 为 true 时跳过结果缓存，
+    previousManifest 为上一次运行的清单时只重新生成受影响的产物，resume 为 true 时从该项目的检查点继续，
+    streamFiles 为 true 时代码文件以 file_partial 流式发送，trace 为 true 时发送 metrics 消息，
+    profile 为 true / "full" / "sample" 时剖析各阶段（profileSampleRate 为采样频率）。
+    """
+
+    def __init__(self, agent_factory: Callable[..., Any], message_sender: MessageSender,
+                 max_concurrency: int = 8, coalesce_progress: bool = False,
+                 compress: Optional[str] = None, compress_threshold: int = 4096,
+                 artifact_dir: Optional[str] = None):
+        self.agent_factory = agent_factory
+        self.message_sender = message_sender
+        self.coalesce_progress = coalesce_progress
+        # 命令行指定的默认压缩编码，新连接在 hello 握手前使用
+        self.compress = compress
+        self.compress_threshold = compress_threshold
+        # fetch_blob 读取的存储，与工作流的 artifact_dir 选项一致
+        self.artifact_store = ArtifactStore(artifact_dir) if artifact_dir else get_artifact_store()
+        self.max_concurrency = max(1, max_concurrency)
+        self.logger = setup_logger('agent_daemon')
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._jobs: Dict[str, asyncio.Task] = {}
+        # 任务的发送器（连接断开时取消该连接上的任务），以及已经开始执行的任务
+        self._job_senders: Dict[str, MessageSender] = {}
+        self._started: Set[str] = set()
+
+    @property
+    def active_jobs(self) -> int:
+        return len(self._jobs)
+
+    async def handle_line(self, line: str, sender: Optional[MessageSender] = None) -> None:
+        """处理一行任务指令"""
+        sender = sender or self.message_sender
+        line = line.strip()
+        if not line:
+            return
+
+        try:
+            job = json.loads(line)
+            if not isinstance(job, dict):
+                raise ValueError('job must be a JSON object')
+        except ValueError as e:
+            await sender.send_message({
+                'type': 'error',
+                'payload': {
+                    'message': f'Invalid job JSON: {str(e)}'
+                }
+            })
+            return
+
+        action = job.get('action', 'start')
+        if action == 'known_blobs':
+            sender.channel.known_hashes.update(str(digest) for digest in job.get('hashes') or [])
+            return
+        if action == 'fetch_blob':
+            await self.fetch_blob(str(job.get('hash', '')), sender)
+            return
+        if action == 'hello':
+            await self.hello(job, sender)
+            return
+
+        project_id = job.get('projectId')
+        if not project_id:
+            await sender.send_message({
+                'type': 'error',
+                'payload': {
+                    'message': 'Job is missing projectId'
+                }
+            })
+            return
+
+        if action == 'start':
+            await self.submit(str(project_id), job.get('config') or {}, sender, job)
+        elif action == 'cancel':
+            await self.cancel(str(project_id), sender)
+        else:
+            await sender.bind(str(project_id)).send_message({
+                'type': 'error',
+                'payload': {
+                    'message': f'Unknown job action: {action}'
+                }
+            })
+
+    async def submit(self, project_id: str, config: Dict[str, Any],
+                     sender: Optional[MessageSender] = None,
+                     job: Optional[Dict[str, Any]] = None) -> None:
+        """提交一个项目任务"""
+        project_sender = (sender or self.message_sender).bind(project_id)
+
+        if project_id in self._jobs:
+            await project_sender.send_message({
+                'type': 'error',
+                'payload': {
+                    'message': f'Project {project_id} is already running'
+                }
+            })
+            return
+
+        task = asyncio.create_task(self._run_job(project_id, config, project_sender, job or {}))
+        self._jobs[project_id] = task
+        self._job_senders[project_id] = project_sender
+        task.add_done_callback(lambda _: self._forget(project_id))
+
+    def _forget(self, project_id: str) -> None:
+        self._jobs.pop(project_id, None)
+        self._job_senders.pop(project_id, None)
+
+    async def cancel(self, project_id: str, sender: Optional[MessageSender] = None) -> bool:
+        """取消一个正在排队或运行中的项目任务"""
+        task = self._jobs.get(project_id)
+        if task is None:
+            await (sender or self.message_sender).bind(project_id).send_message({
+                'type': 'error',
+                'payload': {
+                    'message': f'Project {project_id} is not running'
+                }
+            })
+            return False
+
+        project_sender = self._job_senders[project_id]
+        started = project_id in self._started
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # 还没开始执行就被取消的任务不会进入 _run_job，由这里发送 cancelled 状态
+        if not started:
+            await self._send_status(project_sender, 'cancelled')
+        return True
+
+    async def cancel_channel(self, channel: OutputChannel) -> None:
+        """取消输出到指定通道的所有任务（连接断开时调用）"""
+        tasks = [self._jobs[project_id] for project_id, sender in list(self._job_senders.items())
+                 if sender.channel is channel and project_id in self._jobs]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def fetch_blob(self, digest: str, sender: Optional[MessageSender] = None) -> None:
+        """从内容寻址存储中取回内容"""
+        sender = sender or self.message_sender
+        content = self.artifact_store.get(digest)
+        if content is None:
+            await sender.send_message({
+                'type': 'error',
+                'payload': {
+                    'message': f'Unknown blob: {digest}'
+                }
+            })
+            return
+
+        await sender.send_message({
+            'type': 'blob',
+            'payload': {
+                'hash': digest,
+                'content': content
+            }
+        })
+        sender.channel.known_hashes.add(digest)
+
+    async def hello(self, job: Dict[str, Any], sender: Optional[MessageSender] = None) -> None:
+        """压缩握手：按消费端可接受的编码设置该连接的压缩方式，不声明 accept 时关闭压缩"""
+        sender = sender or self.message_sender
+        accepted = [str(encoding) for encoding in job.get('accept') or []]
+        threshold = job.get('compressThreshold')
+        if not isinstance(threshold, int) or threshold < 0:
+            threshold = self.compress_threshold
+        encoding = negotiate(accepted)
+        sender.channel.compressor = PayloadCompressor(encoding, threshold) if encoding else None
+        await sender.send_message({
+            'type': 'hello',
+            'payload': {
+                'encoding': encoding,
+                'compressThreshold': threshold,
+                'available': available_encodings()
+            }
+        })
+
+    async def _run_job(self, project_id: str, config: Dict[str, Any],
+                       sender: MessageSender, job: Dict[str, Any]) -> None:
+        status = 'failed'
+        self._started.add(project_id)
+        try:
+            if self._slots.locked():
+                await self._send_status(sender, 'queued')
+            async with self._slots:
+                await self._send_status(sender, 'running')
+                agent = self.agent_factory(project_id, config, sender, job)
+                await agent.start_development()
+            status = 'completed'
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            self.logger.info(f"Job {project_id} cancelled")
+        except Exception as e:
+            # ProjectAgent 已经发送过错误消息，这里只记录日志
+            self.logger.error(f"Job {project_id} failed: {str(e)}")
+        finally:
+            # 常驻进程中释放项目的 logger 和日志文件
+            close_project_loggers(project_id)
+            self._started.discard(project_id)
+            await self._send_status(sender, status)
+
+    async def _send_status(self, sender: MessageSender, status: str) -> None:
+        """发送任务状态；消费端已经断开时忽略"""
+        try:
+            await sender.send_message({
+                'type': 'job_status',
+                'payload': {
+                    'status': status,
+                    'activeJobs': self.active_jobs,
+                    'maxConcurrency': self.max_concurrency
+                }
+            })
+        except ConnectionError:
+            self.logger.info(f"Dropped job_status {status}: consumer disconnected")
+
+    async def serve_stdin(self) -> None:
+        """从 stdin 读取任务，直到 EOF 后等待所有任务完成"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        try:
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+            read_line = reader.readline
+        except ValueError:
+            # stdin 被重定向为普通文件时无法使用管道传输，退回到线程读取
+            async def read_line() -> bytes:
+                return (await loop.run_in_executor(None, sys.stdin.buffer.readline))
+
+        while True:
+            line = await read_line()
+            if not line:
+                break
+            await self.handle_line(line.decode('utf-8'))
+
+        await self.wait_all()
+
+    async def serve_socket(self, path: str) -> None:
+        """在 Unix socket 上接收任务，每个连接的消息写回该连接"""
+        if os.path.exists(path):
+            os.unlink(path)
+
+        async def on_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            sender = MessageSender(channel=BatchedOutputChannel(writer, self.coalesce_progress))
+            sender.channel.compressor = create_compressor(self.compress, self.compress_threshold)
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    await self.handle_line(line.decode('utf-8'), sender)
+            except ConnectionError:
+                # 写入失败时读端同样以连接错误结束，按断开处理
+                self.logger.info("Consumer connection lost")
+            finally:
+                # 连接上启动的任务已经没有消费端，取消它们，避免继续写入已关闭的连接
+                await self.cancel_channel(sender.channel)
+                try:
+                    await sender.aclose()
+                except ConnectionError:
+                    pass
+                writer.close()
+
+        server = await asyncio.start_unix_server(on_connection, path=path)
+        self.logger.info(f"Agent daemon listening on {path}")
+        async with server:
+            await server.serve_forever()
+
+    async def wait_all(self) -> None:
+        """等待所有任务结束"""
+        while self._jobs:
+            await asyncio.gather(*list(self._jobs.values()), return_exceptions=True)
+
+    async def shutdown(self) -> None:
+        """取消所有任务"""
+        for task in list(self._jobs.values()):
+            task.cancel()
+        await self.wait_all()
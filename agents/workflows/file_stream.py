@@ -0,0 +1,73 @@
+import asyncio
+from typing import Dict, Any, Awaitable, Callable, Optional
+
+from utils.artifact_store import ArtifactStore, ArtifactWriter
+from utils.message_sender import MessageSender
+
+class FileStreamWriter:
+    """一个正在流式生成的文件
+
+    每个片段写入内容寻址存储的临时文件，并立即发送 file_partial（offset 为该片段在文件中的
+    UTF-8 字节偏移）；close 时提交到存储，发送带 contentHash 和 size 的 file_generated（streamed: true，
+    不含内容），代理端不保留完整内容。临时文件的创建、写入和提交都通过 sink.offload 在线程池中进行。
+    """
+
+    def __init__(self, sink: 'FileStreamSink', file: Dict[str, Any]):
+        self.sink = sink
+        self.file = file
+        self._writer: Optional[ArtifactWriter] = None
+
+    async def _open(self) -> ArtifactWriter:
+        if self._writer is None:
+            self._writer = await self.sink.offload(self.sink.artifact_store.open_writer)
+        return self._writer
+
+    async def write(self, fragment: str) -> None:
+        writer = await self._open()
+        offset = writer.size
+        await self.sink.offload(writer.write, fragment)
+        await self.sink.message_sender.send_message({
+            'type': 'file_partial',
+            'payload': {
+                'fileName': self.file['fileName'],
+                'filePath': self.file['filePath'],
+                'offset': offset,
+                'data': fragment
+            }
+        })
+
+    async def close(self) -> Dict[str, Any]:
+        """提交内容，返回文件记录"""
+        writer = await self._open()
+        digest = await self.sink.offload(writer.commit)
+        file = {**self.file, 'contentHash': digest, 'size': writer.size}
+        record = await self.sink.on_complete(file)
+        await self.sink.message_sender.send_message({
+            'type': 'file_generated',
+            'payload': {**file, 'streamed': True}
+        })
+        return record
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.abort()
+
+class FileStreamSink:
+    """为流式生成的文件创建写入器；on_complete 在文件提交后调用，负责记录清单并返回文件记录
+
+    offload 用来在线程池中运行阻塞的磁盘 I/O（默认为事件循环的 run_in_executor）。
+    """
+
+    def __init__(self, artifact_store: ArtifactStore, message_sender: MessageSender,
+                 on_complete: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 offload: Optional[Callable[..., Awaitable[Any]]] = None):
+        self.artifact_store = artifact_store
+        self.message_sender = message_sender
+        self.on_complete = on_complete
+        self.offload = offload or _run_in_executor
+
+    def open(self, file: Dict[str, Any]) -> FileStreamWriter:
+        return FileStreamWriter(self, file)
+
+async def _run_in_executor(func: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
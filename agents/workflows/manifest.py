@@ -0,0 +1,56 @@
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from utils.result_cache import normalize_config
+
+# 影响产出的配置字段，文件记录中的 inputs 是它们的子集
+CONFIG_FIELDS = ('name', 'projectType', 'description', 'requirements')
+
+def changed_fields(previous_config: Dict[str, Any], config: Dict[str, Any]) -> Set[str]:
+    """两次配置之间发生变化的字段"""
+    previous = normalize_config(previous_config)
+    current = normalize_config(config)
+    return {field for field in CONFIG_FIELDS if previous.get(field) != current.get(field)}
+
+def build_manifest(config: Dict[str, Any], generator_version: str,
+                   records: List[Dict[str, Any]],
+                   stage_outputs: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """构造本次运行的清单：规范化配置、各阶段输出以及每个文件的摘要和依赖字段"""
+    return {
+        'generatorVersion': generator_version,
+        'config': normalize_config(config),
+        'stageOutputs': stage_outputs,
+        'files': records
+    }
+
+class IncrementalPlan:
+    """根据上一次运行的清单判断哪些阶段和文件可以直接复用"""
+
+    def __init__(self, previous_manifest: Optional[Dict[str, Any]], config: Dict[str, Any],
+                 generator_version: str):
+        valid = bool(previous_manifest) and previous_manifest.get('generatorVersion') == generator_version
+        if valid:
+            self.changed = changed_fields(previous_manifest.get('config', {}), config)
+            self.records = {record['filePath']: record for record in previous_manifest.get('files', [])}
+            self.stage_outputs = previous_manifest.get('stageOutputs', {})
+        else:
+            # 没有可用的清单（或生成器版本不同）时视为所有字段都变化了
+            self.changed = set(CONFIG_FIELDS)
+            self.records = {}
+            self.stage_outputs = {}
+
+    def reusable_file(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """文件依赖的字段都没有变化时返回上一次的记录"""
+        record = self.records.get(file_path)
+        if record is None or set(record.get('inputs', CONFIG_FIELDS)) & self.changed:
+            return None
+        return record
+
+    def reusable_stage(self, stage: str, fields: Tuple[str, ...]) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, Any]]]:
+        """阶段依赖的字段都没有变化时返回 (文件记录, 阶段输出)"""
+        if set(fields) & self.changed:
+            return None
+
+        records = [record for record in self.records.values() if record.get('stage') == stage]
+        if not records or any(self.reusable_file(record['filePath']) is None for record in records):
+            return None
+        return records, self.stage_outputs.get(stage, {})
@@ -1,332 +1,529 @@
 import asyncio
+import os
 import time
-from typing import Dict, Any, List
-from roles.product_manager import CustomProductManager
-from roles.architect import CustomArchitect  
-from roles.engineer import CustomEngineer
+from typing import Dict, Any, List, Optional, Set, Tuple, FrozenSet
+from roles.registry import load_role
+from roles.keyword_rules import KEYWORD_INDEX
 from utils.message_sender import MessageSender
 from utils.logger import setup_logger
+from utils.pacing import create_pacer
+from utils.tracing import Span, create_tracer
+from utils.metrics import REGISTRY
+from utils.profiling import create_profiler
+from utils.artifact_store import ArtifactStore, get_artifact_store
+from utils.workspace import RunWorkspace
+from utils.checkpoint_store import CheckpointStore, get_checkpoint_store
+from utils.template_engine import get_template_engine
+from utils.result_cache import ResultCache, config_key, get_result_cache
+from utils.artifact_gc import collect_garbage, gc_due
+from workflows.stage_graph import Stage, StageGraph, StageProgress, StageFunc
+from workflows.manifest import IncrementalPlan, build_manifest
+from workflows.file_stream import FileStreamSink
+
+# 生成逻辑变化时递增，使旧的结果缓存失效（模板内容的变化会自动计入）
+GENERATOR_VERSION = '1'
+
+# 各阶段产出依赖的项目配置字段，用于增量重新生成；代码开发阶段按文件单独判断
+STAGE_FIELDS = {
+    'requirement_analysis': ('name', 'projectType', 'description', 'requirements'),
+    'system_design': ('projectType', 'description'),
+    'testing': ('projectType', 'description'),
+}
+
+ACTIVE_WORKFLOWS = REGISTRY.gauge('agent_active_workflows', 'Workflows currently running')
+WORKFLOWS_TOTAL = REGISTRY.counter('agent_workflows_total', 'Finished workflows by result', ('result',))
+STAGE_SECONDS = REGISTRY.histogram('agent_stage_seconds', 'Workflow stage duration', ('stage',))
 
 class ProjectWorkflow:
-    def __init__(self, project_id: str, config: Dict[str, Any], message_sender: MessageSender):
+    def __init__(self, project_id: str, config: Dict[str, Any], message_sender: MessageSender,
+                 file_concurrency: int = 4, pacing: str = 'real',
+                 chunk_threshold: int = 256 * 1024, chunk_size: int = 64 * 1024,
+                 dedup: bool = False, artifact_store: Optional[ArtifactStore] = None,
+                 artifact_dir: Optional[str] = None,
+                 use_cache: bool = True, result_cache: Optional[ResultCache] = None,
+                 previous_manifest: Optional[Dict[str, Any]] = None, trace: bool = False,
+                 profile: Optional[str] = None, profile_dir: Optional[str] = None,
+                 profile_sample_rate: float = 100.0, workspace_dir: Optional[str] = None,
+                 workspace_keep_runs: int = 5,
+                 resume: bool = False, checkpoint_dir: Optional[str] = None, stream_files: bool = False):
         self.project_id = project_id
         self.config = config
         self.message_sender = message_sender
-        self.logger = setup_logger(project_id)
-        self.generated_files: List[Dict[str, Any]] = []
+        self.logger = setup_logger(project_id, project_id=project_id)
+        # 清单中的文件记录（摘要、大小、所属阶段、依赖字段）和各阶段输出
+        self.file_records: List[Dict[str, Any]] = []
+        self.stage_outputs: Dict[str, Dict[str, Any]] = {}
+        # 节奏控制：real 保持真实等待，none 不等待，virtual 使用虚拟时钟
+        self.pacer = create_pacer(pacing)
+        # 开启追踪时每个阶段结束发送 metrics 消息，工作流结束发送汇总
+        self.tracer = create_tracer(trace)
+        # profile 为 full 时每个阶段写出 cProfile 和 tracemalloc 报告（阶段串行），sample 时写出采样的调用栈
+        self.profiler = create_profiler(profile, project_id, profile_dir, profile_sample_rate)
+        # 超过 chunk_threshold 个字符的文件分块发送
+        self.chunk_threshold = chunk_threshold
+        self.chunk_size = chunk_size
+        # 代码文件边生成边以 file_partial 发送，最后的 file_generated 只带摘要和大小
+        self.stream_files = stream_files
+        # 所有文件都写入内容寻址存储；dedup 时消费端已有的内容只发送摘要引用
+        self.dedup = dedup
+        self.artifact_store = artifact_store or (ArtifactStore(artifact_dir) if artifact_dir else get_artifact_store())
+        # 生成的文件落盘到本次运行的工作区，内存中只保留路径、大小和摘要；每个项目保留最近 workspace_keep_runs 次运行
+        self.workspace = RunWorkspace(project_id, self.artifact_store, workspace_dir, workspace_keep_runs)
+        # 成功结束时清单写入工作区（相对路径），完成消息只带这个路径
+        self.manifest_path: Optional[str] = None
+        self.templates = get_template_engine()
+        # 相同配置的项目直接复用缓存的产出；剖析时总是真实运行各阶段
+        self.use_cache = use_cache and not profile
+        self.result_cache = result_cache
+        self.cache_hit = False
+        # 每个阶段完成（以及每个代码文件生成）后保存检查点；resume 时从检查点继续，
+        # 已完成的阶段和文件按引用重新发送，只运行未完成的部分
+        self.checkpoints = CheckpointStore(checkpoint_dir) if checkpoint_dir else get_checkpoint_store()
+        self.completed_stages: Set[str] = set()
+        self.resumed = False
+        # 检查点在线程池中写入，写入期间的多次保存请求合并为一次（只写最新状态）
+        self._checkpoint_pending = False
+        self._checkpoint_task: Optional[asyncio.Task] = None
+        if resume:
+            checkpoint = self.checkpoints.load(project_id)
+            if checkpoint is not None:
+                previous_manifest = checkpoint
+                self.resumed = True
+        # 提供上一次运行的清单时，只重新生成依赖字段发生变化的阶段和文件
+        self.incremental = IncrementalPlan(previous_manifest, config, self.generator_version())
+        # 项目描述的关键词命中集合，产品经理和架构师共用一次扫描的结果
+        self._keyword_matches: Optional[FrozenSet[str]] = None
         
-        # 初始化角色
-        self.product_manager = CustomProductManager(project_id, message_sender)
-        self.architect = CustomArchitect(project_id, message_sender)
-        self.engineer = CustomEngineer(project_id, message_sender)
+        # 角色在第一次使用时才导入和创建（缓存命中或复用阶段产物时不会加载）
+        self.file_concurrency = file_concurrency
+        self._roles: Dict[str, Any] = {}
+
+    def role(self, name: str) -> Any:
+        """按需创建角色"""
+        instance = self._roles.get(name)
+        if instance is None:
+            options: Dict[str, Any] = {'pacer': self.pacer, 'tracer': self.tracer}
+            if name == 'engineer':
+                options['max_concurrency'] = self.file_concurrency
+            instance = self._roles[name] = load_role(name)(self.project_id, self.message_sender, **options)
+        return instance
+
+    @property
+    def product_manager(self) -> Any:
+        return self.role('product_manager')
+
+    @property
+    def architect(self) -> Any:
+        return self.role('architect')
+
+    @property
+    def engineer(self) -> Any:
+        return self.role('engineer')
+
+    def build_graph(self) -> StageGraph:
+        """声明工作流阶段及其依赖关系，依赖满足的阶段会同时运行"""
+        return StageGraph([
+            # 阶段1: 需求分析
+            Stage('requirement_analysis', self._instrumented('requirement_analysis',
+                  self._reusable('requirement_analysis', self._requirement_analysis)),
+                  inputs=('config',), outputs=('requirements',), weight=2),
+            # 阶段2: 系统设计
+            Stage('system_design', self._instrumented('system_design',
+                  self._reusable('system_design', self._system_design)),
+                  inputs=('config',), outputs=('design',), weight=2),
+            # 阶段3: 代码开发（工程师只读取项目配置，不等待系统设计）
+            Stage('code_development', self._instrumented('code_development', self._code_development),
+                  inputs=('config',), outputs=('code_files',), weight=3),
+            # 阶段4: 测试验证（测试文件只依赖项目配置）
+            Stage('testing', self._instrumented('testing', self._reusable('testing', self._testing_phase)),
+                  inputs=('config',), outputs=('test_file',), weight=1),
+        ], max_parallel=1 if self.profiler.requires_serial else None)
+
+    def keyword_matches(self) -> FrozenSet[str]:
+        """扫描一次项目描述，返回其中出现的规则关键词"""
+        if self._keyword_matches is None:
+            self._keyword_matches = KEYWORD_INDEX.scan(self.config.get('description', ''))
+        return self._keyword_matches
+
+    def generator_version(self) -> str:
+        """生成器版本，包含所有模板源码的摘要"""
+        return f'{GENERATOR_VERSION}:{self.templates.fingerprint()}'
+
+    def cache_key(self) -> str:
+        """规范化配置与生成器版本的缓存键"""
+        return config_key(self.config, self.generator_version())
 
     async def execute(self) -> None:
         """执行完整的项目开发工作流"""
-        
-        # 阶段1: 需求分析
-        await self._requirement_analysis()
-        
-        # 阶段2: 系统设计
-        await self._system_design()
-        
-        # 阶段3: 代码开发
-        await self._code_development()
-        
-        # 阶段4: 测试验证
-        await self._testing_phase()
+        ACTIVE_WORKFLOWS.inc()
+        result = 'failed'
+        try:
+            if not self.tracer.enabled:
+                await self._execute()
+            else:
+                with self.tracer.span('workflow') as span:
+                    await self._execute()
+                await self._send_metrics('summary', span)
+            result = 'cached' if self.cache_hit else 'completed'
+            self.manifest_path = await self.pacer.offload(self.workspace.write_manifest, self.get_manifest())
+            await self._flush_checkpoints()
+            self.checkpoints.clear(self.project_id)
+        except asyncio.CancelledError:
+            result = 'cancelled'
+            raise
+        finally:
+            # 失败或取消时也等最后一次检查点写完，resume 才能从最新状态继续
+            await self._flush_checkpoints()
+            self.profiler.close()
+            ACTIVE_WORKFLOWS.dec()
+            WORKFLOWS_TOTAL.inc(result=result)
+
+    async def _execute(self) -> None:
+        if self.resumed:
+            self.logger.info(f"Resuming project {self.project_id} from checkpoint")
+        cache = (self.result_cache or get_result_cache()) if self.use_cache else None
+        if cache is not None:
+            key = self.cache_key()
+            cached = cache.get(key)
+            # 缓存只保存清单，文件内容从存储读取；任一内容已被清理时按未命中处理
+            if cached is not None and all(self.artifact_store.has(record['contentHash'])
+                                          for record in cached['manifest']['files']):
+                self.logger.info(f"Result cache hit for project {self.project_id}")
+                self.cache_hit = True
+                self.stage_outputs = cached['manifest']['stageOutputs']
+                for record in cached['manifest']['files']:
+                    self.file_records.append(record)
+                    await self.pacer.offload(self.workspace.add, record)
+                    await self._send_file({
+                        'fileName': record['fileName'],
+                        'filePath': record['filePath'],
+                        'content': await self.pacer.offload(self.artifact_store.get, record['contentHash']),
+                        'fileType': record['fileType'],
+                        'createdBy': record['createdBy'],
+                        'contentHash': record['contentHash']
+                    })
+                return
+
+        await self.build_graph().run({'config': self.config})
+
+        if cache is not None:
+            cache.put(key, {'manifest': self.get_manifest()})
+
+        # 定期（每个进程每小时最多一次）回收缓存清单和检查点都不再引用的内容，在线程池中扫描存储；
+        # 未启用结果缓存时不打开（也不创建）缓存数据库
+        if gc_due():
+            await asyncio.get_running_loop().run_in_executor(
+                None, collect_garbage, self.artifact_store, cache, self.checkpoints)
+
+    def get_manifest(self) -> Dict[str, Any]:
+        """本次运行的清单，可作为下一次增量运行的输入"""
+        return build_manifest(self.config, self.generator_version(), self.file_records, self.stage_outputs)
+
+    def _instrumented(self, name: str, run: StageFunc) -> StageFunc:
+        """包装阶段：记录阶段耗时直方图；开启追踪时另外记录 span，阶段结束后发送 metrics 消息；
+        开启剖析时阶段结束后发送 profile 消息列出报告文件"""
+        async def stage(inputs: Dict[str, Any], progress: StageProgress) -> Dict[str, Any]:
+            span = None
+            with STAGE_SECONDS.time(stage=name):
+                async with self.profiler.stage(name):
+                    if not self.tracer.enabled:
+                        outputs = await run(inputs, progress)
+                    else:
+                        with self.tracer.span(name) as span:
+                            outputs = await run(inputs, progress)
+            self.completed_stages.add(name)
+            self._checkpoint()
+            if span is not None:
+                await self._send_metrics('stage', span)
+            if self.profiler.enabled:
+                await self._send_profile(name)
+            return outputs
+        return stage
+
+    def _checkpoint(self) -> None:
+        """请求保存检查点：已完成阶段的输出和文件，以及已生成的代码文件（代码文件可以单独复用）
+
+        序列化和 fsync 在线程池中进行，不阻塞事件循环上的其它项目。
+        """
+        self._checkpoint_pending = True
+        if self._checkpoint_task is None or self._checkpoint_task.done():
+            self._checkpoint_task = asyncio.create_task(self._write_checkpoints())
+
+    async def _write_checkpoints(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._checkpoint_pending:
+            self._checkpoint_pending = False
+            records = [record for record in self.file_records
+                       if record['stage'] in self.completed_stages or record['stage'] == 'code_development']
+            stage_outputs = {name: outputs for name, outputs in self.stage_outputs.items()
+                             if name in self.completed_stages}
+            checkpoint = {
+                **build_manifest(self.config, self.generator_version(), records, stage_outputs),
+                'completedStages': sorted(self.completed_stages)
+            }
+            try:
+                await loop.run_in_executor(None, self.checkpoints.save, self.project_id, checkpoint)
+            except OSError as e:
+                # 检查点只用于恢复，写入失败不影响本次运行
+                self.logger.warning(f"Failed to save checkpoint: {str(e)}")
+
+    async def _flush_checkpoints(self) -> None:
+        """等待进行中的检查点写入完成"""
+        if self._checkpoint_task is not None:
+            await asyncio.shield(self._checkpoint_task)
+
+    async def _send_profile(self, stage: str) -> None:
+        await self.message_sender.send_message({
+            'type': 'profile',
+            'payload': {
+                'stage': stage,
+                'files': [os.path.abspath(path) for path in self.profiler.files.get(stage, [])]
+            }
+        })
 
-    async def _requirement_analysis(self) -> None:
-        """需求分析阶段"""
-        self.logger.info("Starting requirement analysis phase")
-        
+    async def _send_metrics(self, scope: str, span: Span) -> None:
+        await self.message_sender.send_message({
+            'type': 'metrics',
+            'payload': {
+                'scope': scope,
+                **span.to_dict()
+            }
+        })
+
+    def _reusable(self, name: str, run: StageFunc) -> StageFunc:
+        """包装阶段：依赖字段未变化且产物仍在存储中时，直接复用上一次的产物和输出"""
+        async def stage(inputs: Dict[str, Any], progress: StageProgress) -> Dict[str, Any]:
+            reusable = self.incremental.reusable_stage(name, STAGE_FIELDS[name])
+            if reusable is not None:
+                records, outputs = reusable
+                if all(self.artifact_store.has(record['contentHash']) for record in records):
+                    self.logger.info(f"Reusing {name} outputs from previous run")
+                    for record in records:
+                        await self._emit_reference(record)
+                    self.stage_outputs[name] = outputs
+                    return outputs
+
+            outputs = await run(inputs, progress)
+            self.stage_outputs[name] = outputs
+            return outputs
+        return stage
+
+    async def _send_progress(self, stage: str, progress: int, message: str) -> None:
         await self.message_sender.send_message({
             'type': 'progress',
             'payload': {
-                'stage': 'requirement_analysis',
-                'progress': 10,
-                'message': '产品经理正在分析需求...'
+                'stage': stage,
+                'progress': progress,
+                'message': message
             }
         })
 
+    async def _emit_file(self, file: Dict[str, Any], stage: str, inputs: Tuple[str, ...]) -> None:
+        """保存新生成的文件并记录，然后发送（磁盘写入都在线程池中进行，大文件不会阻塞其它项目）"""
+        digest = await self.pacer.offload(self.artifact_store.put, file['content'])
+        file = {**file, 'contentHash': digest}
+        await self._record_file({**file, 'size': len(file['content'].encode('utf-8'))}, stage, inputs)
+        await self._send_file(file)
+
+    async def _record_file(self, file: Dict[str, Any], stage: str, inputs: Tuple[str, ...]) -> Dict[str, Any]:
+        """记录已写入存储的文件（带 contentHash 和 size）：加入清单并放入工作区，代码文件另外保存检查点"""
+        record = {
+            'fileName': file['fileName'],
+            'filePath': file['filePath'],
+            'fileType': file['fileType'],
+            'createdBy': file['createdBy'],
+            'contentHash': file['contentHash'],
+            'size': file['size'],
+            'stage': stage,
+            'inputs': list(inputs)
+        }
+        self.file_records.append(record)
+        await self.pacer.offload(self.workspace.add, record)
+        if stage == 'code_development':
+            self._checkpoint()
+        return record
+
+    async def _emit_reference(self, record: Dict[str, Any]) -> None:
+        """复用上一次运行的文件，只发送摘要引用"""
+        self.file_records.append(record)
+        entry = await self.pacer.offload(self.workspace.add, record)
+        await self.message_sender.send_message({
+            'type': 'file_generated',
+            'payload': {
+                **{name: value for name, value in entry.items() if name not in ('size', 'path')},
+                'contentRef': True,
+                'unchanged': True
+            }
+        })
+
+    async def _send_file(self, file: Dict[str, Any]) -> None:
+        digest = file['contentHash']
+        known_hashes = self.message_sender.channel.known_hashes
+        if self.dedup and digest in known_hashes:
+            await self.message_sender.send_message({
+                'type': 'file_generated',
+                'payload': {
+                    **{key: value for key, value in file.items() if key != 'content'},
+                    'contentRef': True
+                }
+            })
+            return
+
+        if len(file['content']) > self.chunk_threshold:
+            await self.message_sender.send_file(file, self.chunk_size)
+        else:
+            await self.message_sender.send_message({
+                'type': 'file_generated',
+                'payload': file
+            })
+        if self.dedup:
+            known_hashes.add(digest)
+
+    async def _requirement_analysis(self, inputs: Dict[str, Any], progress: StageProgress) -> Dict[str, Any]:
+        """需求分析阶段"""
+        self.logger.info("Starting requirement analysis phase")
+        config = inputs['config']
+
+        await self._send_progress('requirement_analysis', progress(0), '产品经理正在分析需求...')
+
         # 产品经理分析需求
         requirements = await self.product_manager.analyze_requirements(
-            self.config['description'],
-            self.config.get('requirements', [])
+            config['description'],
+            config.get('requirements', []),
+            matches=self.keyword_matches()
         )
         
         # 模拟分析时间
-        await asyncio.sleep(2)
+        await self.pacer.pause(2, 'requirement_analysis')
         
-        await self.message_sender.send_message({
-            'type': 'progress',
-            'payload': {
-                'stage': 'requirement_analysis',
-                'progress': 25,
-                'message': '需求分析完成，生成PRD文档'
-            }
-        })
+        await self._send_progress('requirement_analysis', progress(0.8), '需求分析完成，生成PRD文档')
 
         # 生成PRD文档
-        prd_content = self._generate_prd(requirements)
-        self.generated_files.append({
+        await self._emit_file({
             'fileName': 'PRD.md',
             'filePath': '/docs/PRD.md',
-            'content': prd_content,
+            'content': self._generate_prd(requirements),
             'fileType': 'markdown',
             'createdBy': 'ProductManager'
-        })
+        }, 'requirement_analysis', STAGE_FIELDS['requirement_analysis'])
+        return {'requirements': requirements}
 
-        await self.message_sender.send_message({
-            'type': 'file_generated',
-            'payload': self.generated_files[-1]
-        })
-
-    async def _system_design(self) -> None:
+    async def _system_design(self, inputs: Dict[str, Any], progress: StageProgress) -> Dict[str, Any]:
         """系统设计阶段"""
         self.logger.info("Starting system design phase")
-        
-        await self.message_sender.send_message({
-            'type': 'progress',
-            'payload': {
-                'stage': 'designing',
-                'progress': 35,
-                'message': '架构师正在设计系统架构...'
-            }
-        })
+        config = inputs['config']
+
+        await self._send_progress('designing', progress(0), '架构师正在设计系统架构...')
 
         # 架构师设计系统
         design = await self.architect.design_system(
-            self.config['projectType'],
-            self.config['description']
+            config['projectType'],
+            config['description'],
+            matches=self.keyword_matches()
         )
         
-        await asyncio.sleep(3)
+        await self.pacer.pause(3, 'system_design')
         
-        await self.message_sender.send_message({
-            'type': 'progress',
-            'payload': {
-                'stage': 'designing',
-                'progress': 50,
-                'message': '系统设计完成，生成技术方案文档'
-            }
-        })
+        await self._send_progress('designing', progress(0.8), '系统设计完成，生成技术方案文档')
 
         # 生成技术设计文档
-        design_content = self._generate_design_doc(design)
-        self.generated_files.append({
+        await self._emit_file({
             'fileName': 'DESIGN.md',
             'filePath': '/docs/DESIGN.md',
-            'content': design_content,
+            'content': self._generate_design_doc(design),
             'fileType': 'markdown',
             'createdBy': 'Architect'
-        })
-
-        await self.message_sender.send_message({
-            'type': 'file_generated',
-            'payload': self.generated_files[-1]
-        })
+        }, 'system_design', STAGE_FIELDS['system_design'])
+        return {'design': design}
 
-    async def _code_development(self) -> None:
+    async def _code_development(self, inputs: Dict[str, Any], progress: StageProgress) -> Dict[str, Any]:
         """代码开发阶段"""
         self.logger.info("Starting code development phase")
-        
-        await self.message_sender.send_message({
-            'type': 'progress',
-            'payload': {
-                'stage': 'coding',
-                'progress': 60,
-                'message': '工程师开始编写代码...'
-            }
-        })
-
-        # 工程师开发代码
-        code_files = await self.engineer.develop_code(
-            self.config['projectType'],
-            self.config['description']
-        )
-        
-        await asyncio.sleep(4)
-        
-        # 生成代码文件
-        for i, code_file in enumerate(code_files):
-            progress = 60 + (i + 1) * 10
-            self.generated_files.append(code_file)
-            
-            await self.message_sender.send_message({
-                'type': 'file_generated',
-                'payload': code_file
-            })
-            
-            await self.message_sender.send_message({
-                'type': 'progress',
-                'payload': {
-                    'stage': 'coding',
-                    'progress': min(progress, 85),
-                    'message': f'生成代码文件: {code_file["fileName"]}'
-                }
-            })
-            
-            await asyncio.sleep(1)
-
-    async def _testing_phase(self) -> None:
+        config = inputs['config']
+
+        await self._send_progress('coding', progress(0), '工程师开始编写代码...')
+
+        specs = {spec.file_path: spec for spec in self.engineer.file_specs(config['projectType'])}
+        code_files = []
+
+        # 依赖字段未变化的文件直接复用上一次的产物
+        rebuild = set()
+        for file_path in specs:
+            record = self.incremental.reusable_file(file_path)
+            if (record is None or record.get('stage') != 'code_development'
+                    or not self.artifact_store.has(record['contentHash'])):
+                rebuild.add(file_path)
+                continue
+            await self._emit_reference(record)
+            code_files.append(file_path)
+            await self._send_progress('coding', progress(len(code_files) / len(specs)),
+                                      f'复用代码文件: {record["fileName"]}')
+
+        # 工程师并发生成代码文件，每个文件完成后立即发送
+        if rebuild:
+            sink = None
+            if self.stream_files:
+                sink = FileStreamSink(self.artifact_store, self.message_sender, lambda file: self._record_file(
+                    file, 'code_development', specs[file['filePath']].inputs), self.pacer.offload)
+            async for code_file in self.engineer.iter_code(config['projectType'], config['description'],
+                                                           only=rebuild, sink=sink):
+                if sink is None:
+                    await self._emit_file(code_file, 'code_development', specs[code_file['filePath']].inputs)
+                code_files.append(code_file['filePath'])
+                await self._send_progress('coding', progress(len(code_files) / len(specs)),
+                                          f'生成代码文件: {code_file["fileName"]}')
+
+        return {'code_files': code_files}
+
+    async def _testing_phase(self, inputs: Dict[str, Any], progress: StageProgress) -> Dict[str, Any]:
         """测试验证阶段"""
         self.logger.info("Starting testing phase")
-        
-        await self.message_sender.send_message({
-            'type': 'progress',
-            'payload': {
-                'stage': 'testing',
-                'progress': 90,
-                'message': '正在进行测试验证...'
-            }
-        })
 
-        await asyncio.sleep(2)
+        await self._send_progress('testing', progress(0), '正在进行测试验证...')
+
+        await self.pacer.pause(2, 'testing')
         
         # 生成测试文件
-        test_content = self._generate_test_file()
-        self.generated_files.append({
+        test_file = {
             'fileName': 'test_suite.py',
             'filePath': '/tests/test_suite.py',
-            'content': test_content,
+            'content': self._generate_test_file(),
             'fileType': 'python',
             'createdBy': 'Engineer'
-        })
+        }
+        await self._emit_file(test_file, 'testing', STAGE_FIELDS['testing'])
 
-        await self.message_sender.send_message({
-            'type': 'file_generated',
-            'payload': self.generated_files[-1]
-        })
-
-        await self.message_sender.send_message({
-            'type': 'progress',
-            'payload': {
-                'stage': 'testing',
-                'progress': 95,
-                'message': '测试完成，准备交付'
-            }
-        })
+        await self._send_progress('testing', progress(1), '测试完成，准备交付')
+        return {'test_file': test_file['filePath']}
 
     def _generate_prd(self, requirements: Dict[str, Any]) -> str:
         """生成PRD文档"""
-        return f"""# 产品需求文档 (PRD)
-
-## 项目概述
-- **项目名称**: {self.config.get('name', '未命名项目')}
-- **项目类型**: {self.config['projectType']}
-- **项目描述**: {self.config['description']}
-
-## 功能需求
-{chr(10).join(f"- {req}" for req in self.config.get('requirements', []))}
-
-## 用户故事
-1. 作为用户，我希望能够使用简洁直观的界面
-2. 作为用户，我希望系统响应迅速且稳定
-3. 作为用户，我希望数据安全可靠
-
-## 验收标准
-- 功能完整性：所有需求功能正常运行
-- 性能要求：响应时间小于2秒
-- 兼容性：支持主流浏览器
-- 安全性：数据传输加密，用户信息保护
-
-## 技术约束
-- 前端技术栈：Vue.js 3+
-- 后端技术栈：Node.js + Express
-- 数据库：PostgreSQL
-- 部署环境：云服务器
-
-生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}
-"""
+        return self.templates.render(
+            'workflow/prd',
+            name=self.config.get('name', '未命名项目'),
+            project_type=self.config['projectType'],
+            description=self.config['description'],
+            requirements=chr(10).join(f"- {req}" for req in self.config.get('requirements', [])),
+            generated_at=time.strftime('%Y-%m-%d %H:%M:%S')
+        )
 
     def _generate_design_doc(self, design: Dict[str, Any]) -> str:
         """生成设计文档"""
-        return f"""# 系统设计文档
-
-## 架构概览
-- **架构模式**: {design.get('pattern', 'MVC')}
-- **部署方式**: {design.get('deployment', '云端部署')}
-
-## 技术栈
-- **前端**: Vue.js 3 + Element Plus
-- **后端**: Node.js + Express + TypeScript
-- **数据库**: PostgreSQL
-- **缓存**: Redis
-- **部署**: Docker + Nginx
-
-## 系统架构图
-```
-[前端界面] -> [API网关] -> [业务逻辑] -> [数据访问] -> [数据库]
-     |            |           |           |          |
-   Vue.js      Express    TypeScript     ORM    PostgreSQL
-```
-
-## 数据库设计
-### 主要表结构
-- users: 用户信息表
-- projects: 项目信息表
-- tasks: 任务信息表
-
-## API设计
-### 用户管理
-- POST /api/users/register - 用户注册
-- POST /api/users/login - 用户登录
-- GET /api/users/profile - 获取用户信息
-
-### 项目管理
-- GET /api/projects - 获取项目列表
-- POST /api/projects - 创建新项目
-- GET /api/projects/:id - 获取项目详情
-
-## 安全设计
-- JWT身份验证
-- HTTPS数据传输
-- SQL注入防护
-- XSS攻击防护
-
-生成时间: {time.strftime('%Y-%m-%d %H:%M:%S')}
-"""
+        return self.templates.render(
+            'workflow/design_doc',
+            pattern=design.get('pattern', 'MVC'),
+            deployment=design.get('deployment', '云端部署'),
+            generated_at=time.strftime('%Y-%m-%d %H:%M:%S')
+        )
 
     def _generate_test_file(self) -> str:
         """生成测试文件"""
-        return f"""# 测试套件
-
-import unittest
-from datetime import datetime
-
-class ProjectTestSuite(unittest.TestCase):
-    \"\"\"项目测试套件\"\"\"
-    
-    def setUp(self):
-        \"\"\"测试前置设置\"\"\"
-        self.test_data = {{
-            'project_type': '{self.config['projectType']}',
-            'description': '{self.config['description']}'
-        }}
-    
-    def test_project_creation(self):
-        \"\"\"测试项目创建\"\"\"
-        self.assertIsNotNone(self.test_data)
-        self.assertEqual(self.test_data['project_type'], '{self.config['projectType']}')
-    
-    def test_functionality(self):
-        \"\"\"测试基本功能\"\"\"
-        # 模拟功能测试
-        result = True
-        self.assertTrue(result)
-    
-    def test_performance(self):
-        \"\"\"测试性能\"\"\"
-        start_time = datetime.now()
-        # 模拟性能测试
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-        self.assertLess(duration, 2.0)  # 响应时间小于2秒
-
-if __name__ == '__main__':
-    unittest.main()
-"""
+        return self.templates.render(
+            'workflow/test_file',
+            project_type=self.config['projectType'],
+            description=self.config['description']
+        )
 
     def get_generated_files(self) -> List[Dict[str, Any]]:
-        """获取生成的文件列表"""
-        return self.generated_files
\ No newline at end of file
+        """获取生成的文件列表（工作区路径、大小和摘要，不含内容）"""
+        return self.workspace.records
\ No newline at end of file
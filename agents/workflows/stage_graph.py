@@ -0,0 +1,114 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, Any, List, Tuple, Callable, Awaitable, Optional
+
+StageFunc = Callable[[Dict[str, Any], 'StageProgress'], Awaitable[Dict[str, Any]]]
+
+@dataclass
+class Stage:
+    """工作流阶段节点：声明输入、输出和在总进度中的权重"""
+    name: str
+    run: StageFunc
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    weight: float = 1.0
+
+class StageProgress:
+    """阶段内进度上报，返回换算后的整体进度百分比"""
+
+    def __init__(self, graph: 'StageGraph', stage: Stage):
+        self._graph = graph
+        self._stage = stage
+
+    def __call__(self, fraction: float) -> int:
+        return self._graph._report(self._stage.name, fraction)
+
+class StageGraph:
+    """基于依赖关系的阶段调度器，依赖满足的阶段同时运行（最多 max_parallel 个）"""
+
+    def __init__(self, stages: Optional[List[Stage]] = None,
+                 progress_start: int = 5, progress_end: int = 95,
+                 max_parallel: Optional[int] = None):
+        self.stages: Dict[str, Stage] = {}
+        self.max_parallel = max_parallel
+        self.progress_start = progress_start
+        self.progress_end = progress_end
+        self._fractions: Dict[str, float] = {}
+        for stage in stages or []:
+            self.add(stage)
+
+    def add(self, stage: Stage) -> None:
+        if stage.name in self.stages:
+            raise ValueError(f'Duplicate stage: {stage.name}')
+        self.stages[stage.name] = stage
+
+    def validate(self, initial: Dict[str, Any]) -> None:
+        """检查每个输入都有唯一的来源，并且没有循环依赖"""
+        producers: Dict[str, str] = {key: '<initial>' for key in initial}
+        for stage in self.stages.values():
+            for key in stage.outputs:
+                if key in producers:
+                    raise ValueError(f'Output {key} of stage {stage.name} is already produced by {producers[key]}')
+                producers[key] = stage.name
+
+        for stage in self.stages.values():
+            missing = [key for key in stage.inputs if key not in producers]
+            if missing:
+                raise ValueError(f'Stage {stage.name} depends on unknown inputs: {missing}')
+
+        available = set(initial)
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [name for name, stage in remaining.items() if set(stage.inputs) <= available]
+            if not ready:
+                raise ValueError(f'Cyclic stage dependencies: {sorted(remaining)}')
+            for name in ready:
+                available.update(remaining.pop(name).outputs)
+
+    def progress(self) -> int:
+        """当前整体进度百分比"""
+        total = sum(stage.weight for stage in self.stages.values()) or 1.0
+        done = sum(stage.weight * self._fractions.get(name, 0.0) for name, stage in self.stages.items())
+        return int(self.progress_start + (self.progress_end - self.progress_start) * done / total)
+
+    def _report(self, name: str, fraction: float) -> int:
+        fraction = min(max(fraction, 0.0), 1.0)
+        # 阶段内进度只增不减，保证整体进度单调
+        self._fractions[name] = max(self._fractions.get(name, 0.0), fraction)
+        return self.progress()
+
+    async def run(self, initial: Dict[str, Any]) -> Dict[str, Any]:
+        """运行所有阶段，返回初始值与各阶段输出的合集"""
+        self.validate(initial)
+        values = dict(initial)
+        pending = dict(self.stages)
+        running: Dict[asyncio.Task, Stage] = {}
+        self._fractions = {}
+
+        try:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if self.max_parallel is not None and len(running) >= self.max_parallel:
+                        break
+                    if all(key in values for key in stage.inputs):
+                        del pending[name]
+                        inputs = {key: values[key] for key in stage.inputs}
+                        task = asyncio.create_task(stage.run(inputs, StageProgress(self, stage)))
+                        running[task] = stage
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage = running.pop(task)
+                    outputs = task.result() or {}
+                    missing = [key for key in stage.outputs if key not in outputs]
+                    if missing:
+                        raise ValueError(f'Stage {stage.name} did not produce outputs: {missing}')
+                    values.update({key: outputs[key] for key in stage.outputs})
+                    self._report(stage.name, 1.0)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        return values
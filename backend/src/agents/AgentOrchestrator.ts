@@ -1,6 +1,8 @@
 import { spawn, ChildProcess } from 'child_process'
+import { createHash, Hash } from 'crypto'
 import { EventEmitter } from 'events'
 import path from 'path'
+import zlib from 'zlib'
 import { logger } from '../middleware/logger'
 import { ProjectService } from '../services/ProjectService'
 
@@ -21,8 +23,45 @@ export interface AgentStatus {
   }
 }
 
+// 压缩过的负载字段：消息类型 -> 字段名，字段值为 base64，<字段名>Encoding 标明编码
+const COMPRESSED_FIELDS: Record<string, string> = {
+  file_generated: 'content',
+  file_chunk: 'data',
+  file_partial: 'data',
+  blob: 'content'
+}
+
+function decodePayload(data: any): any {
+  const field = COMPRESSED_FIELDS[data.type]
+  const encoding = field && data.payload?.[`${field}Encoding`]
+  if (!encoding) {
+    return data
+  }
+  const raw = Buffer.from(data.payload[field], 'base64')
+  let decoded: Buffer
+  if (encoding === 'zlib') {
+    decoded = zlib.inflateSync(raw)
+  } else if (encoding === 'zstd' && typeof (zlib as any).zstdDecompressSync === 'function') {
+    decoded = (zlib as any).zstdDecompressSync(raw)
+  } else {
+    throw new Error(`Unsupported payload encoding: ${encoding}`)
+  }
+  const payload = { ...data.payload, [field]: decoded.toString('utf8') }
+  delete payload[`${field}Encoding`]
+  return { ...data, payload }
+}
+
+interface FileTransfer {
+  meta: any
+  chunks: string[]
+  hash: Hash
+  length: number
+}
+
 export class AgentOrchestrator extends EventEmitter {
   private activeProjects: Map<string, ChildProcess> = new Map()
+  private outputBuffers: Map<string, string> = new Map()
+  private fileTransfers: Map<string, FileTransfer> = new Map()
   private projectService: ProjectService
 
   constructor() {
@@ -43,7 +82,11 @@ export class AgentOrchestrator extends EventEmitter {
       const pythonProcess = spawn('python3', [
         path.join(agentsPath, 'main.py'),
         '--project-id', projectId,
-        '--config', JSON.stringify(config)
+        '--config', JSON.stringify(config),
+        // 大文件内容以 zlib 压缩传输，在 handleAgentMessage 中解码
+        '--compress', 'zlib',
+        // 代码文件边生成边以 file_partial 发送，在 handleFilePartial 中拼接
+        '--stream-files'
       ], {
         cwd: agentsPath,
         stdio: ['pipe', 'pipe', 'pipe']
@@ -51,11 +94,17 @@ export class AgentOrchestrator extends EventEmitter {
 
       this.activeProjects.set(projectId, pythonProcess)
 
-      pythonProcess.stdout?.on('data', (data) => {
-        const message = data.toString().trim()
-        if (message) {
-          this.handleAgentMessage(projectId, message)
+      pythonProcess.stdout?.setEncoding('utf8')
+      pythonProcess.stdout?.on('data', (data: string) => {
+        // data 事件可能在一行的中间切分，只处理完整的行，剩余部分留到下一次
+        const buffered = (this.outputBuffers.get(projectId) || '') + data
+        const lastNewline = buffered.lastIndexOf('\n')
+        if (lastNewline === -1) {
+          this.outputBuffers.set(projectId, buffered)
+          return
         }
+        this.outputBuffers.set(projectId, buffered.slice(lastNewline + 1))
+        this.handleAgentMessage(projectId, buffered.slice(0, lastNewline))
       })
 
       pythonProcess.stderr?.on('data', (data) => {
@@ -74,6 +123,7 @@ export class AgentOrchestrator extends EventEmitter {
       pythonProcess.on('close', (code) => {
         logger.info(`Agent process for project ${projectId} exited with code ${code}`)
         this.activeProjects.delete(projectId)
+        this.clearProjectBuffers(projectId)
         
         if (code === 0) {
           this.projectService.updateStatus(projectId, 'completed', 100)
@@ -108,7 +158,7 @@ export class AgentOrchestrator extends EventEmitter {
       
       for (const line of lines) {
         try {
-          const data = JSON.parse(line)
+          const data = decodePayload(JSON.parse(line))
           
           logger.info(`Agent message for project ${projectId}:`, data)
           
@@ -121,7 +171,19 @@ export class AgentOrchestrator extends EventEmitter {
               this.handleProgressUpdate(projectId, data.payload)
               break
             case 'file_generated':
-              this.handleFileGenerated(projectId, data.payload)
+              if (data.payload?.streamed) {
+                this.finishStreamedFile(projectId, data.payload)
+              } else {
+                this.handleFileGenerated(projectId, data.payload)
+              }
+              break
+            case 'file_partial':
+              this.handleFilePartial(projectId, data.payload)
+              break
+            case 'file_begin':
+            case 'file_chunk':
+            case 'file_end':
+              this.handleFileTransfer(projectId, data.type, data.payload)
               break
             case 'agent_message':
               this.handleAgentLog(projectId, data.payload)
@@ -168,6 +230,87 @@ export class AgentOrchestrator extends EventEmitter {
     }
   }
 
+  private handleFileTransfer(projectId: string, type: string, payload: any): void {
+    const key = `${projectId}:${payload.transferId}`
+
+    if (type === 'file_begin') {
+      this.fileTransfers.set(key, { meta: payload, chunks: [], hash: createHash('sha256'), length: 0 })
+      return
+    }
+
+    const transfer = this.fileTransfers.get(key)
+    if (!transfer) {
+      logger.warn(`Unknown file transfer ${payload.transferId} for project ${projectId}`)
+      return
+    }
+
+    if (type === 'file_chunk') {
+      if (payload.index !== transfer.chunks.length) {
+        logger.warn(`Out of order chunk ${payload.index} for transfer ${payload.transferId}`)
+        this.fileTransfers.delete(key)
+        return
+      }
+      const encoded = Buffer.from(payload.data, 'utf8')
+      transfer.hash.update(encoded)
+      transfer.length += encoded.length
+      transfer.chunks.push(payload.data)
+      return
+    }
+
+    this.fileTransfers.delete(key)
+    const digest = transfer.hash.digest('hex')
+    if (transfer.length !== payload.length || digest !== payload.sha256) {
+      logger.error(`File transfer ${payload.transferId} for project ${projectId} failed verification`)
+      return
+    }
+
+    const { transferId, chunkSize, ...meta } = transfer.meta
+    this.handleFileGenerated(projectId, { ...meta, content: transfer.chunks.join('') })
+  }
+
+  private handleFilePartial(projectId: string, payload: any): void {
+    const key = `${projectId}:stream:${payload.filePath}`
+    let transfer = this.fileTransfers.get(key)
+    if (!transfer) {
+      transfer = { meta: payload, chunks: [], hash: createHash('sha256'), length: 0 }
+      this.fileTransfers.set(key, transfer)
+    }
+    if (payload.offset !== transfer.length) {
+      logger.warn(`Out of order fragment at offset ${payload.offset} for ${payload.filePath}`)
+      this.fileTransfers.delete(key)
+      return
+    }
+    const encoded = Buffer.from(payload.data, 'utf8')
+    transfer.hash.update(encoded)
+    transfer.length += encoded.length
+    transfer.chunks.push(payload.data)
+  }
+
+  private finishStreamedFile(projectId: string, payload: any): void {
+    const key = `${projectId}:stream:${payload.filePath}`
+    const transfer = this.fileTransfers.get(key)
+    this.fileTransfers.delete(key)
+    // 空文件没有 file_partial
+    const hash = transfer ? transfer.hash : createHash('sha256')
+    const length = transfer ? transfer.length : 0
+    if (length !== payload.size || hash.digest('hex') !== payload.contentHash) {
+      logger.error(`Streamed file ${payload.filePath} for project ${projectId} failed verification`)
+      return
+    }
+
+    const { streamed, size, ...meta } = payload
+    this.handleFileGenerated(projectId, { ...meta, content: transfer ? transfer.chunks.join('') : '' })
+  }
+
+  private clearProjectBuffers(projectId: string): void {
+    this.outputBuffers.delete(projectId)
+    for (const key of this.fileTransfers.keys()) {
+      if (key.startsWith(`${projectId}:`)) {
+        this.fileTransfers.delete(key)
+      }
+    }
+  }
+
   private handleAgentLog(projectId: string, payload: any): void {
     this.emit('agent_message', projectId, payload)
   }